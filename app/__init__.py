@@ -10,4 +10,18 @@ def create_app():
     from .api.routes import api_bp
     app.register_blueprint(api_bp)
 
+    from .api.areas import get_area_index
+    get_area_index()
+
+    from .api.gazetteer import get_gazetteer
+    get_gazetteer()
+
+    # Процессы графиков создаются до запуска фоновых потоков приложения
+    from .services.visualization import warm_chart_pool
+    warm_chart_pool()
+
+    # Курсы валют читаются с диска сразу, свежие загружаются в фоне
+    from currency_converter import get_converter
+    get_converter().get_rates()
+
     return app
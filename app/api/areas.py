@@ -0,0 +1,133 @@
+import json
+import threading
+
+from app.config import Config
+
+_index = None
+_index_lock = threading.Lock()
+
+class AreaIndex:
+    """
+    Предвычисленный индекс дерева регионов.
+
+    Для каждого региона хранит родителя, глубину, регион первого уровня, название
+    и цепочку предков; времена входа/выхода обхода позволяют проверять вложенность за O(1),
+    а эйлеров обход с разреженной таблицей отвечает на запросы LCA за O(1).
+    """
+
+    def __init__(self, tree):
+        self.root_id = tree["id"]
+        self._name = {}
+        self._parent = {}
+        self._depth = {}
+        self._top = {}
+        self._ancestors = {}
+        self._tin = {}
+        self._tout = {}
+        self._first = {}
+        self._euler = []
+        self._build(tree)
+        self._build_sparse_table()
+
+    def _build(self, tree):
+        timer = 0
+        # Итеративный обход в глубину: (узел, родитель, индекс следующего ребёнка)
+        stack = [(tree, None, 0)]
+        while stack:
+            node, parent, child_pos = stack.pop()
+            area_id = node["id"]
+            if child_pos == 0:
+                depth = self._depth[parent] + 1 if parent is not None else 0
+                self._name[area_id] = node["name"]
+                self._parent[area_id] = parent
+                self._depth[area_id] = depth
+                self._ancestors[area_id] = (area_id,) + (self._ancestors[parent] if parent is not None else ())
+                if depth == 0:
+                    self._top[area_id] = None
+                elif depth == 1:
+                    self._top[area_id] = area_id
+                else:
+                    self._top[area_id] = self._top[parent]
+                self._tin[area_id] = timer
+                self._first[area_id] = len(self._euler)
+                timer += 1
+            self._euler.append(area_id)
+
+            children = node.get("areas", [])
+            if child_pos < len(children):
+                stack.append((node, parent, child_pos + 1))
+                stack.append((children[child_pos], area_id, 0))
+            else:
+                self._tout[area_id] = timer
+
+    def _build_sparse_table(self):
+        depths = [self._depth[a] for a in self._euler]
+        size = len(self._euler)
+        self._log = [0] * (size + 1)
+        for i in range(2, size + 1):
+            self._log[i] = self._log[i // 2] + 1
+        table = [list(range(size))]
+        k = 1
+        while (1 << k) <= size:
+            prev = table[k - 1]
+            half = 1 << (k - 1)
+            row = []
+            for i in range(size - (1 << k) + 1):
+                left, right = prev[i], prev[i + half]
+                row.append(left if depths[left] <= depths[right] else right)
+            table.append(row)
+            k += 1
+        self._sparse = table
+        self._euler_depths = depths
+
+    def __contains__(self, area_id):
+        return area_id in self._name
+
+    def name(self, area_id):
+        return self._name.get(area_id)
+
+    def parent(self, area_id):
+        return self._parent.get(area_id)
+
+    def depth(self, area_id):
+        return self._depth.get(area_id)
+
+    def top_region(self, area_id):
+        """Регион первого уровня (область или город республиканского подчинения)."""
+        return self._top.get(area_id)
+
+    def ancestors(self, area_id):
+        """Цепочка от региона к корню, включая сам регион."""
+        return self._ancestors.get(area_id, ())
+
+    def is_within(self, area_id, ancestor_id):
+        if area_id not in self._tin or ancestor_id not in self._tin:
+            return False
+        return self._tin[ancestor_id] <= self._tin[area_id] < self._tout[ancestor_id]
+
+    def lca(self, a, b):
+        if a not in self._first or b not in self._first:
+            return None
+        left, right = sorted((self._first[a], self._first[b]))
+        k = self._log[right - left + 1]
+        i = self._sparse[k][left]
+        j = self._sparse[k][right - (1 << k) + 1]
+        return self._euler[i if self._euler_depths[i] <= self._euler_depths[j] else j]
+
+    def lca_many(self, area_ids):
+        known = [a for a in area_ids if a in self._first]
+        if not known:
+            return None
+        result = known[0]
+        for area_id in known[1:]:
+            result = self.lca(result, area_id)
+        return result
+
+def get_area_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                with open(Config.AREA_PATH, encoding='utf-8') as f:
+                    _index = AreaIndex(json.load(f))
+    return _index
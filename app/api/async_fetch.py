@@ -0,0 +1,202 @@
+import asyncio
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+from app.config import Config
+from app.api.ratelimit import rate_limiter, backoff_delay, THROTTLE_STATUSES
+from app.api.planner import (
+    fetch_per_page, segment_params, probe_params, needs_split, bisect, page_count, report_truncated, merge_unique
+)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Слоты запросов общие для процесса: параллельные загрузки (например, по регионам),
+# каждая в своём asyncio.run, вместе не превышают Config.FETCH_CONCURRENCY.
+# Слот ждут потоки _slot_waiters: их очередь и очередь семафора обслуживаются по порядку
+_slots = threading.BoundedSemaphore(Config.FETCH_CONCURRENCY)
+_slot_waiters = ThreadPoolExecutor(max_workers=Config.FETCH_CONCURRENCY, thread_name_prefix="fetch-slot")
+
+class AsyncStats:
+    """
+    Запросы асинхронного движка по хостам. Соединения считаются по событиям TCPConnector
+    aiohttp: открытые заново и взятые из keep-alive пула.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = defaultdict(lambda: {"requests": 0, "errors": 0, "connections": 0, "reused": 0})
+
+    def record(self, host, counter):
+        with self._lock:
+            self._hosts[host][counter] += 1
+
+    def trace_config(self):
+        trace = aiohttp.TraceConfig()
+
+        async def on_create(session, ctx, params):
+            self.record(ctx.trace_request_ctx["host"], "connections")
+
+        async def on_reuse(session, ctx, params):
+            self.record(ctx.trace_request_ctx["host"], "reused")
+
+        trace.on_connection_create_end.append(on_create)
+        trace.on_connection_reuseconn.append(on_reuse)
+        return trace
+
+    def stats(self):
+        with self._lock:
+            hosts = {host: dict(entry) for host, entry in self._hosts.items()}
+        for entry in hosts.values():
+            # Доля запросов, получивших уже открытое соединение из пула aiohttp
+            acquired = entry["connections"] + entry["reused"]
+            entry["reuse_rate"] = round(entry["reused"] / acquired, 3) if acquired else None
+        return {"concurrency": Config.FETCH_CONCURRENCY, "hosts": hosts}
+
+async_stats = AsyncStats()
+
+def is_available():
+    return aiohttp is not None
+
+def stats():
+    return async_stats.stats() if is_available() else None
+
+def fetch_all_in_range_async(start_date, end_date, base_params, url):
+    """
+    Синхронная обёртка над асинхронной загрузкой: пробы счётчиков, а затем все страницы
+    всех сегментов плана выполняются как корутины. Одновременных запросов не больше
+    Config.FETCH_CONCURRENCY на весь процесс, даже если обёртки вызваны из нескольких потоков.
+    Возвращает пару (items, complete), как и utils.fetch_all_in_range.
+    """
+    return asyncio.run(_fetch_range(start_date, end_date, base_params, url))
+
+async def _fetch_range(start_date, end_date, base_params, url):
+    timeout = aiohttp.ClientTimeout(sock_connect=Config.HTTP_CONNECT_TIMEOUT, sock_read=Config.HTTP_READ_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=Config.FETCH_CONCURRENCY)
+    headers = {"User-Agent": Config.HTTP_USER_AGENT}
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers,
+                                     trace_configs=[async_stats.trace_config()]) as session:
+        fetcher = _AsyncFetcher(session, url)
+        return await fetcher.fetch_range(start_date, end_date, base_params)
+
+@asynccontextmanager
+async def _request_slot():
+    """Слот из общего _slots; блокирующее ожидание идёт в потоке, а не в цикле событий."""
+    acquired = _slot_waiters.submit(_slots.acquire)
+    try:
+        await asyncio.shield(asyncio.wrap_future(acquired))
+    except asyncio.CancelledError:
+        # Поток всё равно получит слот; вернёт его колбэк, даже если цикл уже закрыт
+        if not acquired.cancel():
+            acquired.add_done_callback(lambda f: _slots.release())
+        raise
+    try:
+        yield
+    finally:
+        _slots.release()
+
+class _AsyncFetcher:
+
+    def __init__(self, session, url):
+        self.session = session
+        self.url = url
+        # Ограничение внутри одного цикла: в ожидании общего слота не больше FETCH_CONCURRENCY корутин
+        self.semaphore = asyncio.Semaphore(Config.FETCH_CONCURRENCY)
+
+    async def fetch_range(self, start_date, end_date, base_params):
+        leaves, complete = await self.plan(start_date, end_date, base_params)
+        per_page = fetch_per_page()
+        jobs = []
+        for start, end, found in leaves:
+            segment = segment_params(start, end, base_params)
+            jobs.extend(self.fetch_page(page, segment) for page in range(page_count(found, per_page)))
+        print(f"[INFO] План загрузки: {len(leaves)} сегментов, {len(jobs)} страниц")
+
+        pages = await asyncio.gather(*jobs)
+        complete = complete and not any(page.get("failed") for page in pages)
+        all_items = merge_unique(pages)
+        print(f"[SUCCESS] Загружено всего за диапазон: {len(all_items)}")
+        return all_items, complete
+
+    async def plan(self, start_date, end_date, base_params):
+        leaves = []
+        complete = True
+        per_page = fetch_per_page()
+        pending = [(start_date, end_date)]
+        while pending:
+            counts = await asyncio.gather(*(self.probe_found(start, end, base_params) for start, end in pending))
+            next_level = []
+            for (start, end), found in zip(pending, counts):
+                if found is None:
+                    complete = False
+                    continue
+                if needs_split(found, per_page):
+                    mid = bisect(start, end)
+                    if mid is not None:
+                        next_level.extend([(start, mid), (mid, end)])
+                        continue
+                    report_truncated(start, end, found, per_page)
+                if found:
+                    leaves.append((start, end, found))
+            pending = next_level
+        return leaves, complete
+
+    async def probe_found(self, start, end, base_params):
+        data = await self.fetch_page(0, probe_params(segment_params(start, end, base_params)))
+        if data.get("failed"):
+            return None
+        return data.get("found", 0)
+
+    async def fetch_page(self, page, base_params):
+        params = dict(base_params)
+        params["page"] = page
+        params.setdefault("per_page", fetch_per_page())
+        query = _query_items(params)
+        host = urlparse(self.url).netloc
+
+        for attempt in range(Config.FETCH_RETRIES):
+            retry_after = None
+            throttled = False
+            try:
+                async with self.semaphore, _request_slot():
+                    await asyncio.sleep(rate_limiter.reserve(host))
+                    async_stats.record(host, "requests")
+                    async with self.session.get(self.url, params=query, trace_request_ctx={"host": host}) as response:
+                        rate_limiter.record_response(host, response.status)
+                        if response.status == 200:
+                            data = await response.json(content_type=None)
+                            data["page"] = page
+                            return data
+                        print(f"[WARNING] Ошибка {response.status} при загрузке страницы {page}")
+                        retry_after = response.headers.get("Retry-After")
+                        throttled = response.status in THROTTLE_STATUSES
+            except Exception as e:
+                async_stats.record(host, "errors")
+                rate_limiter.record(host, "errors")
+                print(f"[ERROR] Ошибка при запросе страницы {page}: {e}")
+            if attempt + 1 == Config.FETCH_RETRIES:
+                break
+            rate_limiter.record(host, "retries")
+            delay = backoff_delay(attempt, retry_after)
+            if throttled:
+                rate_limiter.pause(host, delay)
+            else:
+                await asyncio.sleep(delay)
+
+        print(f"[FAIL] Не удалось загрузить страницу {page}")
+        return {"items": [], "page": page, "failed": True}
+
+def _query_items(params):
+    # aiohttp не принимает bool и списки как значения — раскладываем как requests
+    items = []
+    for key, value in params.items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for v in values:
+            if v is not None:
+                items.append((key, str(v)))
+    return items
@@ -0,0 +1,71 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import Config
+
+def make_cache_key(params):
+    """Нормализует параметры запроса: списки сортируются, ключи упорядочиваются."""
+    normalized = {}
+    for key, value in params.items():
+        if isinstance(value, (list, tuple, set)):
+            value = sorted(str(v) for v in value)
+        normalized[key] = value
+    return json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+
+class ResultCache:
+    """LRU-кэш ограниченного размера с TTL для каждой записи."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            return removed
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+            }
+
+result_cache = ResultCache(Config.RESULT_CACHE_SIZE, Config.RESULT_CACHE_TTL)
+# Решения планировщика запросов по регионам (LCA или по каждому региону)
+plan_cache = ResultCache(Config.RESULT_CACHE_SIZE * 4, Config.RESULT_CACHE_TTL)
@@ -0,0 +1,72 @@
+import json
+import os
+import re
+import threading
+
+from app.config import Config
+
+class KeywordMatcher:
+    """
+    Классификатор IT-вакансий: все ключевые слова собраны в одно скомпилированное
+    регулярное выражение, которое перестраивается только при изменении файла.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or Config.DATA_PATH
+        self.keywords = []
+        self._pattern = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            if self._pattern is None:
+                print(f"[ERROR] Не удалось загрузить ключевые слова из {self.path}: {e}")
+                self._mtime = None
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    keywords = json.load(f).get("it_keywords", [])
+            except Exception as e:
+                print(f"[ERROR] Не удалось загрузить ключевые слова из {self.path}: {e}")
+                keywords = []
+            # Текст вакансии приводится к нижнему регистру, а ключевые слова — нет, как и прежде:
+            # слово с заглавными буквами («тестирование ПО») не совпадает ни с чем
+            keywords = sorted({kw for kw in keywords if kw}, key=len, reverse=True)
+            # Длинные слова идут первыми, чтобы «data scientist» не перекрывался более коротким «data»
+            self._pattern = re.compile("|".join(re.escape(kw) for kw in keywords)) if keywords else None
+            self.keywords = keywords
+            self._mtime = mtime
+            print(f"[DEBUG] Загружено ключевых слов для IT: {len(keywords)}")
+
+    def is_match(self, text):
+        self._refresh()
+        if self._pattern is None or not text:
+            return False
+        return self._pattern.search(text.lower()) is not None
+
+def vacancy_text(v):
+    skills = []
+    for s in v.get("key_skills") or []:
+        if isinstance(s, dict):
+            skills.append(s.get("name") or "")
+        else:
+            skills.append(str(s))
+    return " ".join([
+        v.get("name") or "",
+        v.get("description") or "",
+        " ".join(skills),
+        (v.get("employer") or {}).get("name") or "",
+    ])
+
+it_matcher = KeywordMatcher()
+
+def is_it_vacancy(v):
+    return it_matcher.is_match(vacancy_text(v))
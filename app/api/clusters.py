@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.api.cache import ResultCache
+from app.api.spatial import SpatialIndex
+from app.config import Config
+
+# Размер тайла веб-проекции Меркатора в пикселях
+TILE_SIZE = 256
+MAX_LATITUDE = 85.05112878
+
+def mercator(lat, lng):
+    """Координаты в проекции Меркатора, нормированные к [0, 1) по обеим осям."""
+    x = (np.asarray(lng, dtype=float) + 180.0) / 360.0
+    lat_rad = np.radians(np.clip(np.asarray(lat, dtype=float), -MAX_LATITUDE, MAX_LATITUDE))
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0
+    return x, y
+
+class PointClusterer:
+    """
+    Сеточная кластеризация точек карты по уровням масштаба.
+
+    На уровне zoom мир делится на ячейки по Config.MAP_CLUSTER_CELL_PX пикселей;
+    точки одной ячейки объединяются в кластер с центром в их среднем. Номера ячеек
+    для каждого масштаба считаются один раз и переиспользуются между запросами.
+    Начиная с Config.MAP_MAX_CLUSTER_ZOOM точки отдаются без группировки.
+    """
+
+    def __init__(self, points, cell_px=None, max_zoom=None):
+        self.points = points
+        self.cell_px = cell_px or Config.MAP_CLUSTER_CELL_PX
+        self.max_zoom = Config.MAP_MAX_CLUSTER_ZOOM if max_zoom is None else max_zoom
+        self.lat = np.array([p["lat"] for p in points], dtype=float)
+        self.lng = np.array([p["lng"] for p in points], dtype=float)
+        self._x, self._y = mercator(self.lat, self.lng)
+        self._cells = {}
+        self._index = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.points)
+
+    def spatial_index(self):
+        """Индекс для поиска по радиусу и прямоугольнику; строится при первом запросе."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = SpatialIndex(self.points)
+        return self._index
+
+    def bounds(self):
+        if not self.points:
+            return None
+        return [[float(self.lat.min()), float(self.lng.min())], [float(self.lat.max()), float(self.lng.max())]]
+
+    def _grid_size(self, zoom):
+        return max(int((TILE_SIZE << zoom) // self.cell_px), 1)
+
+    def _cell_coords(self, zoom):
+        cells = self._cells.get(zoom)
+        if cells is None:
+            size = self._grid_size(zoom)
+            cx = np.minimum((self._x * size).astype(np.int64), size - 1)
+            cy = np.minimum((self._y * size).astype(np.int64), size - 1)
+            with self._lock:
+                cells = self._cells.setdefault(zoom, (cx, cy))
+        return cells
+
+    def _point_feature(self, i):
+        point = self.points[i]
+        return dict(point, type="point")
+
+    def clusters(self, bbox, zoom):
+        """
+        Кластеры и одиночные точки в ячейках, пересекающих bbox = (юг, запад, север, восток).
+
+        В выборку попадают ячейки целиком, поэтому состав кластера не зависит от того,
+        какая часть ячейки видна на экране.
+        """
+        zoom = min(max(int(zoom), 0), self.max_zoom)
+        south, west, north, east = bbox
+        if not self.points:
+            return []
+        size = self._grid_size(zoom)
+        (x0, x1), (y1, y0) = mercator([south, north], [west, east])
+        x_min, x_max = int(max(x0, 0.0) * size), int(min(x1, 1.0) * size)
+        y_min, y_max = int(max(y0, 0.0) * size), int(min(y1, 1.0) * size)
+        cx, cy = self._cell_coords(zoom)
+        idx = np.nonzero((cx >= x_min) & (cx <= x_max) & (cy >= y_min) & (cy <= y_max))[0]
+        if not len(idx):
+            return []
+        if zoom >= self.max_zoom:
+            return [self._point_feature(i) for i in idx]
+
+        keys = cy[idx] * size + cx[idx]
+        _, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+        lat = np.bincount(inverse, weights=self.lat[idx]) / counts
+        lng = np.bincount(inverse, weights=self.lng[idx]) / counts
+        features = []
+        for group, count in enumerate(counts):
+            if count == 1:
+                features.append(self._point_feature(idx[first[group]]))
+            else:
+                features.append({
+                    "type": "cluster",
+                    "lat": round(float(lat[group]), 6),
+                    "lng": round(float(lng[group]), 6),
+                    "count": int(count),
+                })
+        return features
+
+class MapStore:
+    """
+    Точки карт недавних анализов в SQLite под id карты, общие для всех процессов-воркеров:
+    страница запрашивает кластеры у любого воркера, а не только у того, что строил анализ.
+    Карта хранится Config.MAP_TTL секунд, записей — не больше Config.MAP_STORE_SIZE.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or Config.MAP_STORE_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS maps (
+                    map_id TEXT PRIMARY KEY,
+                    points TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, map_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT points FROM maps WHERE map_id = ? AND expires_at > ?", (map_id, time.time())).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, map_id, points):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO maps (map_id, points, expires_at) VALUES (?, ?, ?)",
+                (map_id, json.dumps(points, ensure_ascii=False), time.time() + Config.MAP_TTL)
+            )
+            conn.execute("DELETE FROM maps WHERE expires_at <= ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM maps WHERE map_id IN (SELECT map_id FROM maps ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (Config.MAP_STORE_SIZE,)
+            )
+
+    def stats(self):
+        with self._connect() as conn:
+            return {"size": conn.execute("SELECT COUNT(*) FROM maps").fetchone()[0]}
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_map_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MapStore()
+    return _store
+
+# Кластеризаторы карт, уже загруженных этим процессом; точки берутся из MapStore
+map_registry = ResultCache(Config.MAP_REGISTRY_SIZE, Config.MAP_TTL)
+
+def register_map_points(points):
+    """Сохраняет точки анализа для запросов кластеров и возвращает краткое описание карты."""
+    map_id = uuid.uuid4().hex
+    get_map_store().set(map_id, points)
+    clusterer = PointClusterer(points)
+    map_registry.set(map_id, clusterer)
+    return {"id": map_id, "count": len(clusterer), "bounds": clusterer.bounds()}
+
+def get_map_clusterer(map_id):
+    """Кластеризатор карты или None, если карта устарела или не найдена."""
+    clusterer = map_registry.get(map_id)
+    if clusterer is None:
+        points = get_map_store().get(map_id)
+        if points is None:
+            return None
+        clusterer = PointClusterer(points)
+        map_registry.set(map_id, clusterer)
+    return clusterer
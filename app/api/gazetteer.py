@@ -0,0 +1,61 @@
+import json
+import re
+import threading
+
+from app.config import Config
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+def normalize_place(name):
+    """Ключ поиска по названию: нижний регистр, «ё» → «е», без лишних пробелов."""
+    return re.sub(r"\s+", " ", str(name).lower().replace("ё", "е")).strip()
+
+class Gazetteer:
+    """
+    Локальный справочник координат центров регионов из Config.CENTROIDS_PATH.
+
+    Ищет по id региона и по названию; название ищется и целиком, и без уточнения
+    в скобках («Иваново (Брестская область)» → «иваново»). Записи с пометкой
+    approximate (координаты не уточнены) считаются в stats().
+    """
+
+    def __init__(self, path=None):
+        self.path = path or Config.CENTROIDS_PATH
+        with open(self.path, encoding="utf-8") as f:
+            entries = json.load(f)
+        self._by_id = {}
+        self._by_name = {}
+        self.approximate = set()
+        for area_id, entry in entries.items():
+            coords = (entry["lat"], entry["lng"])
+            self._by_id[area_id] = coords
+            if entry.get("approximate"):
+                self.approximate.add(area_id)
+            full = normalize_place(entry["name"])
+            self._by_name[full] = coords
+            short = normalize_place(re.sub(r"\(.*?\)", "", entry["name"]))
+            # Короткое имя не перекрывает точное совпадение другого региона
+            self._by_name.setdefault(short, coords)
+
+    def __contains__(self, area_id):
+        return str(area_id) in self._by_id
+
+    def by_id(self, area_id):
+        return self._by_id.get(str(area_id))
+
+    def by_name(self, name):
+        if not name:
+            return None
+        return self._by_name.get(normalize_place(name))
+
+    def stats(self):
+        return {"areas": len(self._by_id), "approximate": len(self.approximate)}
+
+def get_gazetteer():
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer()
+    return _gazetteer
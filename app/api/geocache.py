@@ -0,0 +1,110 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from app.config import Config
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def normalize_address(address):
+    """Ключ кэша: нижний регистр, без лишних пробелов и знаков препинания по краям."""
+    text = re.sub(r"\s+", " ", str(address).lower().replace("ё", "е"))
+    text = re.sub(r"\s*,\s*", ", ", text)
+    return text.strip(" ,.;")
+
+class GeocodeCache:
+    """
+    Дисковый кэш геокодера в SQLite, общий для всех процессов-воркеров.
+
+    Найденные координаты живут Config.GEOCODE_TTL_FOUND секунд, ответы «не найдено» —
+    Config.GEOCODE_TTL_NOT_FOUND, а ошибки запроса — Config.GEOCODE_TTL_ERROR.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or Config.GEOCODE_CACHE_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.expired = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS geocode (
+                    address TEXT PRIMARY KEY,
+                    lat REAL,
+                    lng REAL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, address):
+        """Возвращает (found, (lat, lng)); found=False, если записи нет или она устарела."""
+        key = normalize_address(address)
+        with self._connect() as conn:
+            row = conn.execute("SELECT lat, lng, expires_at FROM geocode WHERE address = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return False, (None, None)
+            lat, lng, expires_at = row
+            if expires_at < time.time():
+                self.expired += 1
+                self.misses += 1
+                return False, (None, None)
+            if lat is None or lng is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return True, (lat, lng)
+
+    def set(self, address, lat, lng, error=False):
+        if error:
+            ttl = Config.GEOCODE_TTL_ERROR
+        elif lat is None or lng is None:
+            ttl = Config.GEOCODE_TTL_NOT_FOUND
+        else:
+            ttl = Config.GEOCODE_TTL_FOUND
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode (address, lat, lng, expires_at) VALUES (?, ?, ?, ?)",
+                (normalize_address(address), lat, lng, time.time() + ttl)
+            )
+
+    def stats(self):
+        with self._connect() as conn:
+            size = conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "size": size,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": round((self.hits + self.negative_hits) / lookups, 3) if lookups else None,
+            }
+
+def get_geocode_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = GeocodeCache()
+    return _cache
@@ -0,0 +1,77 @@
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import Config
+from app.api.ratelimit import rate_limiter
+
+class HttpClient:
+    """
+    Общая для всего процесса HTTP-сессия с keep-alive пулом соединений.
+
+    Размер пула на хост равен Config.FETCH_CONCURRENCY, чтобы параллельная загрузка
+    страниц переиспользовала соединения, а не открывала новые TCP+TLS подключения.
+    """
+
+    def __init__(self, pool_size=None, connect_timeout=None, read_timeout=None):
+        self.pool_size = pool_size or Config.FETCH_CONCURRENCY
+        self.timeout = (
+            connect_timeout or Config.HTTP_CONNECT_TIMEOUT,
+            read_timeout or Config.HTTP_READ_TIMEOUT,
+        )
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = Config.HTTP_USER_AGENT
+        self.adapter = HTTPAdapter(pool_connections=Config.HTTP_POOL_HOSTS, pool_maxsize=self.pool_size)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._errors = defaultdict(int)
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlparse(url).netloc
+        rate_limiter.acquire(host)
+        self.record(host)
+        try:
+            response = self.session.get(url, **kwargs)
+        except requests.RequestException:
+            self.record(host, error=True)
+            rate_limiter.record(host, "errors")
+            raise
+        rate_limiter.record_response(host, response.status_code)
+        return response
+
+    def record(self, host, error=False):
+        """Учитывает запрос сессии; асинхронный движок ведёт свой учёт (async_fetch.async_stats)."""
+        with self._lock:
+            if error:
+                self._errors[host] += 1
+            else:
+                self._requests[host] += 1
+
+    def stats(self):
+        hosts = {}
+        with self._lock:
+            for host, count in self._requests.items():
+                hosts[host] = {"requests": count, "errors": self._errors.get(host, 0), "connections": 0}
+
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+            entry = hosts.setdefault(host, {"requests": 0, "errors": 0, "connections": 0})
+            entry["connections"] += pool.num_connections
+
+        for entry in hosts.values():
+            # Доля запросов, обслуженных уже открытым соединением
+            reused = max(entry["requests"] - entry["connections"], 0)
+            entry["reuse_rate"] = round(reused / entry["requests"], 3) if entry["requests"] else None
+        return {"pool_size": self.pool_size, "timeout": list(self.timeout), "hosts": hosts}
+
+http_client = HttpClient()
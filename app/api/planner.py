@@ -0,0 +1,64 @@
+import math
+from datetime import timedelta
+
+from app.config import Config
+
+# API отдаёт не больше API_RESULT_CAP вакансий на один запрос, как бы ни был велик found
+API_RESULT_CAP = 2000
+# Размер страницы, который API использует, если per_page не передан, и максимально допустимый
+API_DEFAULT_PER_PAGE = 20
+API_MAX_PER_PAGE = 100
+_DATETIME_FMT = "%Y-%m-%dT%H:%M:%S"
+
+def segment_params(start, end, base_params):
+    params = dict(base_params)
+    params["date_from"] = start.strftime(_DATETIME_FMT)
+    params["date_to"] = end.strftime(_DATETIME_FMT)
+    return params
+
+def probe_params(params):
+    """Минимальная страница: нужен только счётчик found."""
+    probe = dict(params)
+    probe["page"] = 0
+    probe["per_page"] = 1
+    return probe
+
+def fetch_per_page():
+    return max(1, min(Config.FETCH_PER_PAGE or API_DEFAULT_PER_PAGE, API_MAX_PER_PAGE))
+
+def reachable_limit(per_page):
+    """Сколько вакансий реально можно выгрузить постранично: page * per_page < API_RESULT_CAP."""
+    return (API_RESULT_CAP // per_page) * per_page
+
+def needs_split(found, per_page):
+    return found is not None and found > reachable_limit(per_page)
+
+def bisect(start, end):
+    """Делит диапазон пополам или возвращает None, если он уже не больше минимального."""
+    if end - start <= timedelta(seconds=Config.FETCH_MIN_SEGMENT_SECONDS):
+        return None
+    mid = start + (end - start) / 2
+    return mid.replace(microsecond=0)
+
+def page_count(found, per_page):
+    if not found:
+        return 0
+    return min(math.ceil(found / per_page), reachable_limit(per_page) // per_page)
+
+def report_truncated(start, end, found, per_page):
+    print(f"[WARNING] Сегмент {start} — {end} содержит {found} вакансий при лимите API {reachable_limit(per_page)}, "
+          f"но дробить его дальше нельзя — часть вакансий не будет загружена")
+
+def merge_unique(pages):
+    """Склеивает элементы страниц, убирая дубли на общих границах сегментов."""
+    seen = set()
+    items = []
+    for page in pages:
+        for v in page.get("items", []):
+            vid = v.get("id")
+            if vid is not None:
+                if vid in seen:
+                    continue
+                seen.add(vid)
+            items.append(v)
+    return items
@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from app.config import Config
+
+# Коды ответа, которыми внешние сервисы сообщают о превышении нагрузки
+THROTTLE_STATUSES = (429, 503)
+
+class TokenBucket:
+    """Маркерная корзина: rate маркеров в секунду, не больше capacity подряд."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens=1):
+        """Забирает маркер и возвращает, сколько секунд нужно подождать перед запросом."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def pause(self, seconds):
+        """Уводит корзину в долг, чтобы все ожидающие запросы выждали seconds."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+class RateLimiter:
+    """Реестр корзин по хостам и счётчики успешных и ограниченных запросов."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._metrics = defaultdict(lambda: defaultdict(int))
+
+    def bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                limits = Config.RATE_LIMITS.get(host, Config.RATE_LIMIT_DEFAULT)
+                bucket = self._buckets[host] = TokenBucket(limits["rate"], limits["burst"])
+            return bucket
+
+    def reserve(self, host):
+        wait = self.bucket(host).reserve()
+        if wait:
+            self.record(host, "limiter_wait_seconds", wait)
+        return wait
+
+    def acquire(self, host):
+        wait = self.reserve(host)
+        if wait:
+            time.sleep(wait)
+
+    def pause(self, host, delay):
+        self.bucket(host).pause(delay)
+
+    def record_response(self, host, status):
+        if status in THROTTLE_STATUSES:
+            self.record(host, "throttled")
+        elif status < 400:
+            self.record(host, "success")
+        else:
+            self.record(host, "failed")
+
+    def record(self, host, metric, value=1):
+        with self._lock:
+            self._metrics[host][metric] += value
+
+    def stats(self):
+        with self._lock:
+            result = {}
+            for host, metrics in self._metrics.items():
+                entry = {name: round(value, 3) for name, value in metrics.items()}
+                bucket = self._buckets.get(host)
+                if bucket is not None:
+                    entry["rate"] = bucket.rate
+                    entry["burst"] = bucket.capacity
+                result[host] = entry
+            return result
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+def backoff_delay(attempt, retry_after=None):
+    """Экспоненциальная пауза с полным джиттером; Retry-After от сервера имеет приоритет."""
+    delay = parse_retry_after(retry_after)
+    if delay is not None:
+        return min(delay, Config.BACKOFF_MAX)
+    return random.uniform(0, min(Config.BACKOFF_MAX, Config.BACKOFF_BASE * 2 ** attempt))
+
+rate_limiter = RateLimiter()
@@ -1,11 +1,35 @@
-from flask import Blueprint, render_template, request, redirect, url_for, jsonify
-from app.api.utils import extract_filter_data, generate_filter_query, load_vacancies_with_filters, load_area_tree, _area_index
-from app.services.visualization import generate_all_visualizations
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, send_from_directory, abort
+from app.api.utils import extract_filter_data, generate_filter_query, load_vacancies_with_filters, get_area_ancestors, probe_areas_found
+from app.api.cache import result_cache, plan_cache
+from app.api.clusters import get_map_clusterer, get_map_store, map_registry
+from app.api.http import http_client
+from app.api import async_fetch
+from app.api.ratelimit import rate_limiter
+from app.api.geocache import get_geocode_cache
+from app.services.visualization import generate_all_visualizations, registry as chart_registry
+from app.services.render_cache import get_render_cache
+from app.config import Config
+from currency_converter import get_converter
+import plotly
+import math
 import os
 from datetime import datetime
 
 api_bp = Blueprint('api', __name__)
 
+# plotly.js из пакета plotly: версия библиотеки совпадает с версией описаний графиков
+PLOTLY_JS_DIR = os.path.join(os.path.dirname(plotly.__file__), 'package_data')
+
+@api_bp.app_context_processor
+def plotly_bundle():
+    return {"plotly_js_url": url_for('api.plotly_js', version=plotly.__version__)}
+
+@api_bp.route('/vendor/plotly-<version>.min.js')
+def plotly_js(version):
+    if version != plotly.__version__:
+        abort(404)
+    return send_from_directory(PLOTLY_JS_DIR, 'plotly.min.js', max_age=Config.PLOTLY_JS_MAX_AGE)
+
 @api_bp.route('/')
 def index():
     return render_template('index.html')
@@ -15,33 +39,48 @@ def analyze():
     filters = extract_filter_data(request.form)
 
     # --- Fallback логика ---
+    # Пробами found (per_page=1) выбираем самую узкую непустую область:
+    # выбранные регионы → их области → вся страна. Загружается только она, один раз
     def get_vacancies_with_fallback(filters):
-        # 1. Пробуем по выбранным регионам (города/области)
-        filter_params = generate_filter_query(filters)
-        filtered_vacancies = load_vacancies_with_filters(filter_params, original_area_ids=filters.get("area", []))
-        if filtered_vacancies:
-            return filtered_vacancies, filter_params
-        # 2. Если выбраны города, пробуем по их областям
-        area_ids = filters.get('area', [])
-        load_area_tree()
-        parent_areas = set()
-        for aid in area_ids:
-            parent = _area_index.get(aid, {}).get('parent_id')
-            if parent:
-                parent_areas.add(parent)
-        if parent_areas:
-            filters2 = dict(filters)
-            filters2['area'] = list(parent_areas)
-            filter_params2 = generate_filter_query(filters2)
-            filtered_vacancies2 = load_vacancies_with_filters(filter_params2)
-            if filtered_vacancies2:
-                return filtered_vacancies2, filter_params2
-        # 3. Если всё равно пусто — анализ по всей стране
-        filters3 = dict(filters)
-        filters3['area'] = []
-        filter_params3 = generate_filter_query(filters3)
-        filtered_vacancies3 = load_vacancies_with_filters(filter_params3)
-        return filtered_vacancies3, filter_params3
+        country_filters = dict(filters)
+        country_filters['area'] = []
+        country_params = generate_filter_query(country_filters)
+
+        area_ids = [str(a) for a in filters.get('area', [])]
+        levels = []
+        if area_ids:
+            # 1. Выбранные регионы (города/области)
+            levels.append(("выбранные регионы", generate_filter_query(filters), area_ids))
+            # 2. Если выбраны города, их области
+            parent_areas = set()
+            for aid in area_ids:
+                ancestors = get_area_ancestors(aid)
+                if len(ancestors) > 1 and ancestors[1] != country_params['area']:
+                    parent_areas.add(ancestors[1])
+            if parent_areas and parent_areas != set(area_ids):
+                filters2 = dict(filters)
+                filters2['area'] = sorted(parent_areas)
+                levels.append(("области", generate_filter_query(filters2), sorted(parent_areas)))
+        # 3. Вся страна
+        levels.append(("вся страна", country_params, None))
+
+        # Область загрузки — первый уровень, где проба не нулевая (или не удалась)
+        scope, found = len(levels) - 1, None
+        for i, (name, params, level_area_ids) in enumerate(levels[:-1]):
+            found = probe_areas_found(params, level_area_ids)
+            print(f"[DEBUG] Проба {name} {level_area_ids}: found={found}")
+            if found != 0:
+                scope = i
+                break
+        name, params, scope_area_ids = levels[scope]
+        if scope == len(levels) - 1 and area_ids:
+            print("[DEBUG] Fallback на всю страну")
+        # Одна загрузка; load_vacancies_with_filters сама сужает её до scope_area_ids.
+        # Если IT-фильтр оставил уровень пустым, вторая область не загружается
+        vacancies = load_vacancies_with_filters(params, scope_area_ids, found if scope_area_ids else None)
+        if not vacancies:
+            print(f"[DEBUG] {name}: после фильтрации IT-вакансий ничего не осталось")
+        return vacancies, params
 
     filtered_vacancies, used_filter_params = get_vacancies_with_fallback(filters)
 
@@ -89,7 +128,82 @@ def analyze():
 
 @api_bp.route('/clear_cache', methods=['POST'])
 def clear_cache():
-    return jsonify({"status": "ok", "message": "Кэш очищен"})
+    removed = result_cache.clear()
+    plan_cache.clear()
+    return jsonify({"status": "ok", "message": "Кэш очищен", "removed": removed})
+
+@api_bp.route('/stats')
+def stats():
+    return jsonify({
+        "result_cache": result_cache.stats(),
+        "plan_cache": plan_cache.stats(),
+        "http": http_client.stats(),
+        "http_async": async_fetch.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "geocode_cache": get_geocode_cache().stats(),
+        "map_registry": map_registry.stats(),
+        "map_store": get_map_store().stats(),
+        "currency_rates": get_converter().stats(),
+        "charts": chart_registry.stats(),
+        "render_cache": get_render_cache().stats() if get_render_cache() else None,
+    })
+
+def _parse_bbox(value):
+    """bbox=юг,запад,север,восток: четыре конечных числа в пределах широт и долгот."""
+    bbox = [float(x) for x in value.split(',')]
+    if len(bbox) != 4:
+        raise ValueError("bbox должен содержать 4 числа")
+    south, west, north, east = bbox
+    if not (_valid_lat(south) and _valid_lat(north) and _valid_lng(west) and _valid_lng(east)):
+        raise ValueError("bbox вне допустимых широт и долгот")
+    return bbox
+
+def _valid_lat(value):
+    return math.isfinite(value) and -90 <= value <= 90
+
+def _valid_lng(value):
+    return math.isfinite(value) and -180 <= value <= 180
+
+@api_bp.route('/map_clusters/<map_id>')
+def map_clusters(map_id):
+    """Кластеры точек карты для видимой области: bbox=юг,запад,север,восток и zoom."""
+    clusterer = get_map_clusterer(map_id)
+    if clusterer is None:
+        return jsonify({"error": "Карта устарела, повторите анализ"}), 404
+    try:
+        bbox = _parse_bbox(request.args.get('bbox', ''))
+        zoom = int(request.args.get('zoom', 7))
+    except ValueError as e:
+        return jsonify({"error": f"Некорректные параметры bbox или zoom: {e}"}), 400
+    return jsonify({"zoom": zoom, "features": clusterer.clusters(bbox, zoom)})
+
+@api_bp.route('/map_search/<map_id>')
+def map_search(map_id):
+    """
+    Вакансии карты в радиусе (lat, lng, radius_km) или в прямоугольнике
+    (bbox=юг,запад,север,восток): id вакансий и статистика зарплат.
+    """
+    clusterer = get_map_clusterer(map_id)
+    if clusterer is None:
+        return jsonify({"error": "Карта устарела, повторите анализ"}), 404
+    index = clusterer.spatial_index()
+    try:
+        if request.args.get('bbox'):
+            found = index.bbox(*_parse_bbox(request.args['bbox']))
+        else:
+            lat = float(request.args['lat'])
+            lng = float(request.args['lng'])
+            radius_km = float(request.args.get('radius_km', 5))
+            if not (_valid_lat(lat) and _valid_lng(lng)):
+                raise ValueError("lat или lng вне допустимых пределов")
+            if not 0 < radius_km <= Config.MAP_SEARCH_MAX_RADIUS_KM:
+                raise ValueError(f"radius_km должен быть от 0 до {Config.MAP_SEARCH_MAX_RADIUS_KM}")
+            found = index.radius(lat, lng, radius_km)
+    except KeyError:
+        return jsonify({"error": "Укажите bbox или lat, lng и radius_km"}), 400
+    except ValueError as e:
+        return jsonify({"error": f"Некорректные параметры поиска: {e}"}), 400
+    return jsonify(index.summary(found))
 
 @api_bp.route('/export/<export_type>', methods=['POST'])
 def export(export_type):
@@ -0,0 +1,116 @@
+import math
+
+import numpy as np
+
+from app.config import Config
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+def salary_value(salary):
+    """Одно число для зарплаты: середина вилки или известная граница."""
+    if not salary:
+        return None
+    low, high = salary.get("from"), salary.get("to")
+    if low and high:
+        return (low + high) / 2
+    return low or high or None
+
+def haversine_km(lat, lng, lats, lngs):
+    """Расстояние по большому кругу от точки (lat, lng) до массивов координат, км."""
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def salary_stats(values):
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {"count": 0, "min": None, "max": None, "mean": None, "median": None}
+    return {
+        "count": int(len(values)),
+        "min": round(float(values.min()), 2),
+        "max": round(float(values.max()), 2),
+        "mean": round(float(values.mean()), 2),
+        "median": round(float(np.median(values)), 2),
+    }
+
+class SpatialIndex:
+    """
+    Индекс точек вакансий по сетке широта/долгота с ячейкой Config.SPATIAL_CELL_DEG градусов.
+
+    Точки отсортированы по номеру ячейки (строка сетки × число столбцов + столбец), поэтому
+    ячейки одной строки, попадающие в прямоугольник, лежат в массиве подряд и находятся
+    двоичным поиском; точная проверка выполняется только для точек этих ячеек.
+    """
+
+    def __init__(self, points, cell_deg=None):
+        self.cell_deg = cell_deg or Config.SPATIAL_CELL_DEG
+        lat = np.array([p["lat"] for p in points], dtype=float)
+        lng = np.array([p["lng"] for p in points], dtype=float)
+        salary = np.array([salary_value(p.get("salary")) or np.nan for p in points], dtype=float)
+        ids = np.array([p.get("id") for p in points], dtype=object)
+
+        self._lat0 = float(lat.min()) if len(lat) else 0.0
+        self._lng0 = float(lng.min()) if len(lng) else 0.0
+        self._lat1 = float(lat.max()) if len(lat) else 0.0
+        self._lng1 = float(lng.max()) if len(lng) else 0.0
+        self._rows = int((self._lat1 - self._lat0) // self.cell_deg) + 1
+        self._cols = int((self._lng1 - self._lng0) // self.cell_deg) + 1
+        keys = self._row(lat) * self._cols + self._col(lng)
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self.lat = lat[order]
+        self.lng = lng[order]
+        self.salary = salary[order]
+        self.ids = ids[order]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _row(self, lat):
+        return np.clip(np.floor((np.asarray(lat) - self._lat0) / self.cell_deg), 0, self._rows - 1).astype(np.int64)
+
+    def _col(self, lng):
+        return np.clip(np.floor((np.asarray(lng) - self._lng0) / self.cell_deg), 0, self._cols - 1).astype(np.int64)
+
+    def _candidates(self, south, west, north, east):
+        """
+        Позиции точек в ячейках, пересекающих прямоугольник. Прямоугольник обрезается
+        по границам точек индекса, поэтому число просматриваемых строк сетки не зависит
+        от размеров запроса.
+        """
+        if not len(self) or not all(math.isfinite(v) for v in (south, west, north, east)):
+            return np.empty(0, dtype=np.int64)
+        if south > north or west > east or north < self._lat0 or south > self._lat1 or east < self._lng0 or west > self._lng1:
+            return np.empty(0, dtype=np.int64)
+        row_min, row_max = int(self._row(south)), int(self._row(north))
+        col_min, col_max = int(self._col(west)), int(self._col(east))
+        rows = np.arange(row_min, row_max + 1, dtype=np.int64) * self._cols
+        starts = np.searchsorted(self._keys, rows + col_min, side="left")
+        ends = np.searchsorted(self._keys, rows + col_max, side="right")
+        spans = [np.arange(s, e) for s, e in zip(starts, ends) if e > s]
+        return np.concatenate(spans) if spans else np.empty(0, dtype=np.int64)
+
+    def bbox(self, south, west, north, east):
+        idx = self._candidates(south, west, north, east)
+        lat, lng = self.lat[idx], self.lng[idx]
+        return idx[(lat >= south) & (lat <= north) & (lng >= west) & (lng <= east)]
+
+    def radius(self, lat, lng, radius_km):
+        if not all(math.isfinite(v) for v in (lat, lng, radius_km)) or radius_km < 0:
+            return np.empty(0, dtype=np.int64)
+        dlat = radius_km / KM_PER_DEGREE
+        # Долготный размах круга наибольший на его дальней от экватора широте
+        far_lat = min(abs(lat) + dlat, 89.9)
+        dlng = radius_km / (KM_PER_DEGREE * math.cos(math.radians(far_lat)))
+        idx = self._candidates(lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+        return idx[haversine_km(lat, lng, self.lat[idx], self.lng[idx]) <= radius_km]
+
+    def summary(self, idx):
+        """Ответ на запрос: id вакансий и статистика зарплат по найденным точкам."""
+        return {
+            "count": int(len(idx)),
+            "ids": [i for i in self.ids[idx].tolist() if i is not None],
+            "salary": salary_stats(self.salary[idx]),
+        }
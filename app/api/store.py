@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from app.config import Config
+
+_store = None
+_store_lock = threading.Lock()
+
+# Параметры, которые не влияют на набор вакансий внутри партиции
+_PARTITION_PARAMS = ("date_from", "date_to", "area", "page", "per_page")
+
+def query_key(params):
+    """Подпись запроса без дат и региона: по ней делятся партиции хранилища."""
+    signature = {}
+    for key, value in params.items():
+        if key in _PARTITION_PARAMS:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            value = sorted(str(v) for v in value)
+        signature[key] = value
+    raw = json.dumps(signature, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+class VacancyStore:
+    """
+    Локальное хранилище вакансий, разбитое на партиции (запрос, регион, день публикации).
+
+    Закрытые прошедшие дни загружаются из API один раз, а сегодняшний день
+    и окно из Config.STORE_REFRESH_DAYS предыдущих дней периодически обновляются.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or Config.STORE_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._locks_guard = threading.Lock()
+        self._sync_locks = {}
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS vacancies (
+                    query_key TEXT NOT NULL,
+                    area_id TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    vacancy_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (query_key, area_id, day, vacancy_id)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS partitions (
+                    query_key TEXT NOT NULL,
+                    area_id TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    synced_at TEXT NOT NULL,
+                    PRIMARY KEY (query_key, area_id, day)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def load(self, params, start_date, end_date, fetch_range):
+        """
+        Возвращает вакансии за дни [start_date, end_date] включительно,
+        предварительно догрузив недостающие партиции через fetch_range(start, end, params),
+        который должен вернуть пару (items, complete).
+        """
+        key = query_key(params)
+        area_id = str(params.get("area", ""))
+        days = _days_between(start_date, end_date)
+
+        # Синхронизации разных запросов и регионов идут параллельно, одной партиции — по очереди
+        with self._partition_lock(key, area_id):
+            stale = self._stale_days(key, area_id, days)
+            for run in _contiguous_runs(stale):
+                self._sync_run(key, area_id, run, params, fetch_range)
+
+        return self._read(key, area_id, days)
+
+    def _partition_lock(self, key, area_id):
+        with self._locks_guard:
+            return self._sync_locks.setdefault((key, area_id), threading.Lock())
+
+    def _stale_days(self, key, area_id, days):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT day, synced_at FROM partitions WHERE query_key = ? AND area_id = ? AND day BETWEEN ? AND ?",
+                (key, area_id, days[0].isoformat(), days[-1].isoformat())
+            ).fetchall()
+        synced = {row[0]: datetime.fromisoformat(row[1]) for row in rows}
+
+        now = datetime.now()
+        refresh_from = now.date() - timedelta(days=Config.STORE_REFRESH_DAYS)
+        stale = []
+        for day in days:
+            synced_at = synced.get(day.isoformat())
+            if synced_at is None:
+                stale.append(day)
+            elif day >= refresh_from and (now - synced_at).total_seconds() > Config.STORE_REFRESH_TTL:
+                stale.append(day)
+        print(f"[STORE] Партиций в диапазоне: {len(days)}, требуют синхронизации: {len(stale)}")
+        return stale
+
+    def _sync_run(self, key, area_id, run, params, fetch_range):
+        start = datetime.combine(run[0], datetime.min.time())
+        end = datetime.combine(run[-1] + timedelta(days=1), datetime.min.time())
+        print(f"[STORE] Синхронизация {area_id}: {run[0]} — {run[-1]}")
+        items, complete = fetch_range(start, end, params)
+
+        by_day = {day.isoformat(): {} for day in run}
+        for v in items:
+            day = (v.get("published_at") or "")[:10]
+            if day in by_day and v.get("id") is not None:
+                by_day[day][str(v["id"])] = v
+
+        synced_at = datetime.now().isoformat()
+        with self._connect() as conn:
+            for day, vacancies in by_day.items():
+                conn.execute(
+                    "DELETE FROM vacancies WHERE query_key = ? AND area_id = ? AND day = ?",
+                    (key, area_id, day)
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO vacancies VALUES (?, ?, ?, ?, ?)",
+                    [(key, area_id, day, vid, json.dumps(v, ensure_ascii=False)) for vid, v in vacancies.items()]
+                )
+                if complete:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO partitions VALUES (?, ?, ?, ?)",
+                        (key, area_id, day, synced_at)
+                    )
+        if not complete:
+            print(f"[WARNING] Синхронизация {run[0]} — {run[-1]} неполная, партиции будут загружены повторно")
+
+    def _read(self, key, area_id, days):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT vacancy_id, payload FROM vacancies "
+                "WHERE query_key = ? AND area_id = ? AND day BETWEEN ? AND ? ORDER BY day",
+                (key, area_id, days[0].isoformat(), days[-1].isoformat())
+            ).fetchall()
+        # Переопубликованная вакансия может лежать в нескольких днях — берём самую свежую
+        unique = {}
+        for vacancy_id, payload in rows:
+            unique[vacancy_id] = payload
+        print(f"[STORE] Прочитано из хранилища: {len(unique)} вакансий")
+        return [json.loads(payload) for payload in unique.values()]
+
+    def clear(self):
+        """
+        Удаляет все партиции. Пока держится _locks_guard, новые синхронизации не начинаются,
+        а начатые дописывают свои партиции до очистки. load держит одну блокировку
+        партиции за раз, поэтому захват всех блокировок подряд не приводит к взаимоблокировке.
+        """
+        with self._locks_guard:
+            locks = list(self._sync_locks.values())
+            for lock in locks:
+                lock.acquire()
+            try:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM vacancies")
+                    conn.execute("DELETE FROM partitions")
+            finally:
+                for lock in locks:
+                    lock.release()
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = VacancyStore()
+    return _store
+
+def _days_between(start_date, end_date):
+    start = start_date.date() if isinstance(start_date, datetime) else start_date
+    end = end_date.date() if isinstance(end_date, datetime) else end_date
+    if end < start:
+        end = start
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+def _contiguous_runs(days):
+    runs = []
+    for day in days:
+        if runs and runs[-1][-1] + timedelta(days=1) == day:
+            runs[-1].append(day)
+        else:
+            runs.append([day])
+    return runs
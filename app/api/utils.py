@@ -1,16 +1,20 @@
-import json
-import requests
 from datetime import datetime, timedelta
 from app.config import Config
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.api.store import get_store
+from app.api.cache import result_cache, plan_cache, make_cache_key
+from app.api.http import http_client
+from app.api.ratelimit import rate_limiter, backoff_delay, THROTTLE_STATUSES
+from app.api.classifier import is_it_vacancy
+from app.api.areas import get_area_index
+from app.api import async_fetch
+from app.api.planner import (
+    fetch_per_page, segment_params, probe_params, needs_split, bisect, page_count, report_truncated, merge_unique
+)
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
-import re
-import os
+from urllib.parse import urlparse
 API_URL = "https://api.rabota.by/vacancies"
 
-_area_tree = None
-_area_index = {}
-
 def extract_filter_data(form):
     filters = {}
 
@@ -37,7 +41,6 @@ def extract_filter_data(form):
     return filters
 
 def generate_filter_query(filters):
-    load_area_tree()
     params = {}
 
     if filters.get("text"):
@@ -85,28 +88,9 @@ def generate_filter_query(filters):
     return params
 
 def load_area_tree():
-    global _area_tree, _area_index
-    if _area_tree:
-        return
-
-    with open(Config.AREA_PATH, encoding='utf-8') as f:
-        _area_tree = json.load(f)
-        _area_index = {}
-
-        def index_area(area, parent=None):
-            _area_index[area['id']] = {
-                'name': area['name'],
-                'parent_id': parent,
-                'id': area['id']
-            }
-            for child in area.get('areas', []):
-                index_area(child, area['id'])
-
-        index_area(_area_tree)
+    return get_area_index()
 
 def find_common_area(area_ids):
-    load_area_tree()
-
     if not area_ids:
         return None
 
@@ -114,140 +98,194 @@ def find_common_area(area_ids):
         print(f"[DEBUG] Одиночный регион: {area_ids[0]}")
         return area_ids[0]
 
-    def get_path(area_id):
-        path = []
-        current = area_id
-        visited = set()
-        while current and current not in visited:
-            visited.add(current)
-            path.append(current)
-            current = _area_index.get(current, {}).get("parent_id")
-        return path[::-1]
-
-    paths = [get_path(aid) for aid in area_ids if aid in _area_index]
-    if not paths:
+    lca = get_area_index().lca_many([str(a) for a in area_ids])
+    if lca is None:
         print("[DEBUG] Нет путей для LCA")
         return None
 
-    min_len = min(len(p) for p in paths)
-    lca = None
-    for i in range(min_len):
-        step = [p[i] for p in paths]
-        if all(x == step[0] for x in step):
-            lca = step[0]
-        else:
-            break
-
     print(f"[DEBUG] Найден LCA: {lca}")
     return lca
 
-from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import json
-import os
-import re
-
-def load_vacancies_with_filters(params, original_area_ids=None):
-    def fetch_all_in_range(start_date, end_date, base_params):
-        all_items = []
-        step = timedelta(days=7)
-
-        current_week_start = start_date
-        while current_week_start < end_date:
-            week_end = min(current_week_start + step, end_date)
-            items = fetch_segment(current_week_start, week_end, base_params)
-            if len(items) >= 2000:
-                print(f"[INFO] Неделя {current_week_start.date()} — {week_end.date()} перегружена, дроблю по дням...")
-                current_day_start = current_week_start
-                while current_day_start < week_end:
-                    day_end = current_day_start + timedelta(days=1)
-                    items_day = fetch_segment(current_day_start, day_end, base_params)
-                    if len(items_day) >= 2000:
-                        print(f"[INFO] День {current_day_start.date()} перегружен, дроблю по 6 часам...")
-                        current_hour = current_day_start
-                        while current_hour < day_end:
-                            next_hour = current_hour + timedelta(hours=6)
-                            items_hour = fetch_segment(current_hour, next_hour, base_params)
-                            all_items.extend(items_hour)
-                            current_hour = next_hour
-                    else:
-                        all_items.extend(items_day)
-                    current_day_start = day_end
-            else:
-                all_items.extend(items)
-            current_week_start = week_end
-        return all_items
-
-    def fetch_segment(start, end, base_params):
-        fmt = "%Y-%m-%dT%H:%M:%S" if isinstance(start, datetime) and start.time() != datetime.min.time() else "%Y-%m-%d"
-        segment_params = dict(base_params)
-        segment_params["date_from"] = start.strftime(fmt)
-        segment_params["date_to"] = end.strftime(fmt)
-
-        print(f"[INFO] Загружаю вакансии: {segment_params['date_from']} → {segment_params['date_to']}")
-        segment_items = []
+def get_area_ancestors(area_id):
+    """Цепочка от региона к корню дерева, включая сам регион."""
+    if area_id is None:
+        return ()
+    return get_area_index().ancestors(str(area_id))
+
+def narrow_to_areas(vacancies, area_ids):
+    """Оставляет вакансии, регион которых совпадает с одним из area_ids или вложен в него."""
+    index = get_area_index()
+    area_ids = [str(a) for a in area_ids]
+    narrowed = []
+    for v in vacancies:
+        area_id = (v.get("area") or {}).get("id")
+        if area_id is None:
+            continue
+        area_id = str(area_id)
+        if any(area_id == a or index.is_within(area_id, a) for a in area_ids):
+            narrowed.append(v)
+    return narrowed
+
+def fetch_all_in_range(start_date, end_date, base_params):
+    leaves, complete = plan_segments(start_date, end_date, base_params)
+    per_page = fetch_per_page()
+    jobs = []
+    for start, end, found in leaves:
+        segment = segment_params(start, end, base_params)
+        jobs.extend((page, segment) for page in range(page_count(found, per_page)))
+    print(f"[INFO] План загрузки: {len(leaves)} сегментов, {len(jobs)} страниц")
+
+    with ThreadPoolExecutor(max_workers=Config.FETCH_CONCURRENCY) as executor:
+        pages = list(executor.map(lambda job: fetch_page(*job), jobs))
+
+    complete = complete and not any(page.get("failed") for page in pages)
+    all_items = merge_unique(pages)
+    print(f"[SUCCESS] Загружено всего за диапазон: {len(all_items)}")
+    return all_items, complete
+
+def plan_segments(start_date, end_date, base_params):
+    """
+    Делит диапазон пополам, пока в каждом сегменте found не станет меньше лимита API.
+    Счётчики запрашиваются минимальной страницей, вакансии на этом этапе не загружаются.
+    Возвращает список (start, end, found) непустых сегментов и признак полноты плана.
+    """
+    leaves = []
+    complete = True
+    per_page = fetch_per_page()
+    pending = [(start_date, end_date)]
+    with ThreadPoolExecutor(max_workers=Config.FETCH_CONCURRENCY) as executor:
+        while pending:
+            counts = list(executor.map(lambda bounds: probe_found(bounds[0], bounds[1], base_params), pending))
+            next_level = []
+            for (start, end), found in zip(pending, counts):
+                if found is None:
+                    complete = False
+                    continue
+                if needs_split(found, per_page):
+                    mid = bisect(start, end)
+                    if mid is not None:
+                        next_level.extend([(start, mid), (mid, end)])
+                        continue
+                    report_truncated(start, end, found, per_page)
+                if found:
+                    leaves.append((start, end, found))
+            pending = next_level
+    return leaves, complete
+
+def probe_found(start, end, base_params):
+    data = fetch_page(0, probe_params(segment_params(start, end, base_params)))
+    if data.get("failed"):
+        return None
+    return data.get("found", 0)
 
-        try:
-            first_page = fetch_page(0, segment_params)
-            total_pages = first_page.get("pages", 0)
-            segment_items.extend(first_page.get("items", []))
-            print(f"[INFO] Получена страница 1/{total_pages}, вакансий: {len(first_page.get('items', []))}")
-
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                futures = [executor.submit(fetch_page, page, segment_params) for page in range(1, total_pages)]
-                for future in as_completed(futures):
-                    result = future.result()
-                    page_items = result.get("items", [])
-                    print(f"[INFO] Получена страница {result.get('page', '?') + 1}/{total_pages}, вакансий: {len(page_items)}")
-                    segment_items.extend(page_items)
-        except Exception as e:
-            print(f"[ERROR] Ошибка при загрузке сегмента {segment_params['date_from']} — {segment_params['date_to']}: {e}")
+def fetch_cleaned_in_range(start_date, end_date, base_params):
+    if Config.FETCH_ENGINE == "async" and async_fetch.is_available():
+        items, complete = async_fetch.fetch_all_in_range_async(start_date, end_date, base_params, API_URL)
+    else:
+        items, complete = fetch_all_in_range(start_date, end_date, base_params)
+    return [extract_relevant_fields(v) for v in items], complete
 
-        print(f"[SUCCESS] Загружено всего за сегмент: {len(segment_items)}")
-        return segment_items
+def load_it_vacancies(params, start_date, end_date):
+    if Config.STORE_ENABLED:
+        cleaned = get_store().load(params, start_date, end_date, fetch_cleaned_in_range)
+    else:
+        cleaned, _ = fetch_cleaned_in_range(start_date, end_date + timedelta(days=1), params)
 
+    before = len(cleaned)
+    cleaned = [v for v in cleaned if is_it_vacancy(v)]
+    print(f'[DEBUG] IT-фильтрация: до={before}, после={len(cleaned)}')
+    return cleaned
+
+def load_cached_it_vacancies(params, start_date, end_date):
+    cache_key = make_cache_key(params)
+    cleaned = result_cache.get(cache_key)
+    if cleaned is None:
+        cleaned = load_it_vacancies(params, start_date, end_date)
+        result_cache.set(cache_key, cleaned)
+    else:
+        print(f"[CACHE] Результат взят из кэша: {len(cleaned)} вакансий")
+    return cleaned
+
+def plan_area_queries(params, area_ids, start_date, end_date, per_area_found=None):
+    """
+    Выбирает между одним запросом по общему предку (LCA) выбранных регионов и
+    параллельными запросами по каждому региону: сравнивает found, полученный пробами,
+    и возвращает список параметров запросов более дешёвого плана.
+    per_area_found — уже известная сумма found по регионам (например, из probe_areas_found);
+    тогда пробуется только общий предок.
+    """
+    area_ids = sorted(set(str(a) for a in area_ids or []))
+    if len(area_ids) < 2 or str(params.get("area")) in area_ids:
+        return [params]
+
+    plan_key = make_cache_key(dict(params, area=[params.get("area")] + area_ids))
+    plan = plan_cache.get(plan_key)
+    if plan is None:
+        start = start_date
+        end = end_date + timedelta(days=1)
+        candidates = [params]
+        if per_area_found is None:
+            candidates += [dict(params, area=aid) for aid in area_ids]
+        with ThreadPoolExecutor(max_workers=Config.FETCH_CONCURRENCY) as executor:
+            counts = list(executor.map(lambda p: probe_found(start, end, p), candidates))
+
+        if any(found is None for found in counts):
+            print("[WARNING] Не удалось оценить стоимость планов, использую запрос по общему региону")
+            return [params]
+        lca_found = counts[0]
+        if per_area_found is None:
+            per_area_found = sum(counts[1:])
+        plan = "per_area" if per_area_found < lca_found else "lca"
+        print(f"[DEBUG] План по регионам {area_ids}: LCA {params.get('area')} → {lca_found}, "
+              f"по отдельности → {per_area_found}, выбран {plan}")
+        plan_cache.set(plan_key, plan)
+
+    if plan == "per_area":
+        return [dict(params, area=aid) for aid in area_ids]
+    return [params]
+
+def request_date_range(params):
+    """Диапазон дат запроса; без date_from/date_to подставляются последние 30 дней."""
     if "date_from" not in params or not params["date_from"]:
         params["date_from"] = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
     if "date_to" not in params or not params["date_to"]:
         params["date_to"] = datetime.now().strftime('%Y-%m-%d')
-    print(f"[DEBUG] Используем диапазон дат: {params['date_from']} — {params['date_to']}")
-
     start_date = datetime.strptime(params["date_from"].split("T")[0], "%Y-%m-%d")
     end_date = datetime.strptime(params["date_to"].split("T")[0], "%Y-%m-%d")
+    return start_date, end_date
+
+def probe_areas_found(params, area_ids):
+    """
+    Сумма found по регионам area_ids за диапазон дат params: по одной пробе per_page=1
+    на регион, без загрузки страниц. None, если какая-то проба не удалась.
+    """
+    start_date, end_date = request_date_range(params)
+    candidates = [dict(params, area=str(aid)) for aid in area_ids]
+    with ThreadPoolExecutor(max_workers=min(Config.FETCH_CONCURRENCY, len(candidates))) as executor:
+        counts = list(executor.map(lambda p: probe_found(start_date, end_date + timedelta(days=1), p), candidates))
+    if any(found is None for found in counts):
+        return None
+    return sum(counts)
 
-    all_items = fetch_all_in_range(start_date, end_date, params)
-    cleaned = [extract_relevant_fields(v) for v in all_items]
-
-    keywords_path = os.path.join("app", "data", "vacancies.json")
-    try:
-        with open(keywords_path, encoding="utf-8") as f:
-            it_keywords = json.load(f).get("it_keywords", [])
-            print(f"[DEBUG] Загружено ключевых слов для IT: {len(it_keywords)}")
-    except Exception as e:
-        print(f"[ERROR] Не удалось загрузить ключевые слова из vacancies.json: {e}")
-        it_keywords = []
-
-    def is_it_vacancy(v):
-        fields = [
-            (v.get('name') or '').lower(),
-            (v.get('description') or '').lower(),
-            ' '.join([s.get('name', '').lower() for s in (v.get('key_skills') or [])]),
-            (v.get('employer', {}).get('name') or '').lower()
-        ]
-        joined = ' '.join(fields)
-        for kw in it_keywords:
-            kw_regex = re.escape(kw)
-            if re.search(r'\b' + kw_regex + r'\b', joined) or kw in joined:
-                return True
-        return False
+def load_vacancies_with_filters(params, original_area_ids=None, per_area_found=None):
+    start_date, end_date = request_date_range(params)
+    print(f"[DEBUG] Используем диапазон дат: {params['date_from']} — {params['date_to']}")
 
-    before = len(cleaned)
-    cleaned = [v for v in cleaned if is_it_vacancy(v)]
-    print(f'[DEBUG] IT-фильтрация: до={before}, после={len(cleaned)}')
+    plans = plan_area_queries(params, original_area_ids, start_date, end_date, per_area_found)
+    with ThreadPoolExecutor(max_workers=len(plans)) as executor:
+        results = list(executor.map(lambda p: load_cached_it_vacancies(p, start_date, end_date), plans))
+
+    seen = set()
+    cleaned = []
+    for plan_items in results:
+        for v in plan_items:
+            if v.get("id") in seen:
+                continue
+            seen.add(v.get("id"))
+            cleaned.append(v)
 
     if original_area_ids:
-        original_area_ids = set(str(a) for a in original_area_ids)
-        cleaned = [v for v in cleaned if str(v.get('area', {}).get('id')) in original_area_ids]
+        cleaned = narrow_to_areas(cleaned, original_area_ids)
         print(f"[DEBUG] Фильтрация по исходным регионам: осталось {len(cleaned)} вакансий")
 
     return cleaned
@@ -257,25 +295,35 @@ def load_vacancies_with_filters(params, original_area_ids=None):
 def fetch_page(page, base_params):
     params = dict(base_params)
     params["page"] = page
-    headers = {
-        "User-Agent": "JobAnalyzer/1.0"
-    }
+    params.setdefault("per_page", fetch_per_page())
 
-    for attempt in range(3):
+    host = urlparse(API_URL).netloc
+    for attempt in range(Config.FETCH_RETRIES):
+        retry_after = None
+        throttled = False
         try:
-            response = requests.get(API_URL, params=params, headers=headers, timeout=10)
+            response = http_client.get(API_URL, params=params)
             if response.status_code == 200:
                 data = response.json()
                 data["page"] = page
                 return data
-            else:
-                print(f"[WARNING] Ошибка {response.status_code} при загрузке страницы {page}")
+            print(f"[WARNING] Ошибка {response.status_code} при загрузке страницы {page}")
+            retry_after = response.headers.get("Retry-After")
+            throttled = response.status_code in THROTTLE_STATUSES
         except Exception as e:
             print(f"[ERROR] Ошибка при запросе страницы {page}: {e}")
-        sleep(1)
+        if attempt + 1 == Config.FETCH_RETRIES:
+            break
+        rate_limiter.record(host, "retries")
+        delay = backoff_delay(attempt, retry_after)
+        if throttled:
+            # Пауза в корзине хоста притормаживает все потоки, а не только текущий
+            rate_limiter.pause(host, delay)
+        else:
+            sleep(delay)
 
     print(f"[FAIL] Не удалось загрузить страницу {page}")
-    return {"items": [], "page": page}
+    return {"items": [], "page": page, "failed": True}
 
 def extract_relevant_fields(v):
     address = v.get("address") or {}
@@ -1,6 +1,95 @@
+import os
+
 class Config:
     DATA_PATH = 'app/data/vacancies.json'
     AREA_PATH = 'app/data/belarus_structure.json'
+    CENTROIDS_PATH = 'app/data/area_centroids.json'
+    STORE_PATH = 'cache/vacancies.sqlite3'
+    STORE_ENABLED = True
+    # Сколько последних дней (кроме сегодняшнего) перезагружаются при каждой синхронизации
+    STORE_REFRESH_DAYS = 1
+    # Не чаще, чем раз в N секунд, для дней из окна обновления
+    STORE_REFRESH_TTL = 600
+    RESULT_CACHE_SIZE = 32
+    RESULT_CACHE_TTL = 900
+    # Число параллельных запросов к API и размер пула соединений на хост
+    FETCH_CONCURRENCY = 10
+    # "async" — все сегменты и страницы через asyncio/aiohttp, "threads" — по сегменту в пуле потоков
+    FETCH_ENGINE = "async"
+    # Минимальная длина сегмента, до которой планировщик делит перегруженный диапазон
+    FETCH_MIN_SEGMENT_SECONDS = 60
+    # Размер страницы выдачи; API допускает не больше 100 (по умолчанию отдаёт 20)
+    FETCH_PER_PAGE = 100
+    HTTP_POOL_HOSTS = 4
+    HTTP_CONNECT_TIMEOUT = 5
+    HTTP_READ_TIMEOUT = 10
+    HTTP_USER_AGENT = "JobAnalyzer/1.0"
+    GEOCODE_TIMEOUT = 5
+    GEOCODE_CACHE_PATH = 'cache/geocode.sqlite3'
+    # Сколько адресов геокодируется параллельно при построении карты
+    GEOCODE_WORKERS = 8
+    # Курсы валют НБРБ: время жизни, пауза перед повтором после ошибки и файл последних курсов
+    RATES_URL = 'https://www.nbrb.by/api/exrates/rates?periodicity=0'
+    RATES_TTL = 6 * 3600
+    RATES_RETRY = 5 * 60
+    RATES_CACHE_PATH = 'cache/rates.json'
+    # Дневные курсы для перевода зарплат по дате публикации: таблица, снимок для работы без сети
+    # (None — снимка нет, как его получить, описано в README) и сколько дней можно брать
+    # курс последнего известного дня
+    RATES_BY_PUBLICATION_DATE = True
+    RATES_HISTORY_PATH = 'cache/rates_history.sqlite3'
+    RATES_SNAPSHOT_PATH = None
+    RATES_HISTORY_MAX_GAP_DAYS = 7
+    # Кластеризация карты: размер ячейки сетки в пикселях и масштаб, с которого точки не группируются
+    MAP_CLUSTER_CELL_PX = 60
+    MAP_MAX_CLUSTER_ZOOM = 16
+    # Точки карт недавних анализов: файл, общий для воркеров, число карт и время жизни, секунды
+    MAP_STORE_PATH = 'cache/maps.sqlite3'
+    MAP_STORE_SIZE = 500
+    MAP_TTL = 7 * 24 * 3600
+    # Сколько загруженных карт процесс держит в памяти для запросов кластеров
+    MAP_REGISTRY_SIZE = 32
+    # Наибольший радиус поиска вакансий на карте (/map_search), км
+    MAP_SEARCH_MAX_RADIUS_KM = 500
+    # Размер ячейки пространственного индекса в градусах (около 5 км по широте)
+    SPATIAL_CELL_DEG = 0.05
+    # Какие графики строить на странице анализа (ключи реестра visualization.registry);
+    # None — все, что выводит шаблон analysis.html
+    VISUALIZATION_CHARTS = None
+    # Процессы для параллельного построения графиков; 0 — графики строятся по очереди в процессе приложения.
+    # По умолчанию до 4, одно ядро остаётся процессу приложения; на одноядерной машине пул не нужен
+    VISUALIZATION_PROCESSES = min(4, (os.cpu_count() or 1) - 1)
+    # Кэш готовых фрагментов графиков по хэшу агрегатов: записей в памяти и их время жизни, секунды
+    RENDER_CACHE_ENABLED = True
+    RENDER_CACHE_SIZE = 256
+    RENDER_CACHE_TTL = 24 * 3600
+    # Дисковый уровень кэша фрагментов (None — только память), число записей и время жизни, секунды
+    RENDER_CACHE_PATH = 'cache/render.sqlite3'
+    RENDER_CACHE_DISK_SIZE = 2000
+    RENDER_CACHE_DISK_TTL = 30 * 24 * 3600
+    # Увеличивается при изменении отрисовки графиков, чтобы не отдавать старые фрагменты
+    RENDER_CACHE_VERSION = 1
+    # Гистограмма зарплат: число столбцов, шкала ('linear' или 'log') и квантили,
+    # за которыми значения попадают в крайние столбцы
+    SALARY_HISTOGRAM_BINS = 20
+    SALARY_HISTOGRAM_SCALE = 'linear'
+    SALARY_HISTOGRAM_CLIP = (0.01, 0.99)
+    # Сколько браузер хранит plotly.js; адрес файла содержит версию библиотеки, секунды
+    PLOTLY_JS_MAX_AGE = 365 * 24 * 3600
+    # Время жизни записей кэша геокодера, секунды
+    GEOCODE_TTL_FOUND = 90 * 24 * 3600
+    GEOCODE_TTL_NOT_FOUND = 7 * 24 * 3600
+    GEOCODE_TTL_ERROR = 10 * 60
+    # Лимиты запросов на хост: rate — запросов в секунду, burst — допустимая пачка подряд
+    RATE_LIMITS = {
+        "api.rabota.by": {"rate": 20, "burst": 10},
+        "geocode-maps.yandex.ru": {"rate": 10, "burst": 5},
+        "www.nbrb.by": {"rate": 2, "burst": 2},
+    }
+    RATE_LIMIT_DEFAULT = {"rate": 20, "burst": 10}
+    FETCH_RETRIES = 3
+    BACKOFF_BASE = 0.5
+    BACKOFF_MAX = 30
     ALLOWED_FILTERS = {
         "text": str,
         "area": int,
@@ -0,0 +1,154 @@
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from app.services.render_cache import fingerprint
+
+class AnalysisContext:
+    """
+    Входные данные одного анализа и посчитанные по ним агрегаты.
+    Агрегат считается при первом обращении ctx[name] и дальше берётся из памяти.
+    """
+
+    def __init__(self, registry, **inputs):
+        self.registry = registry
+        self.values = dict(inputs)
+        self.timings = {}
+        self._nested = 0.0
+
+    def __getitem__(self, name):
+        if name not in self.values:
+            outer, self._nested = self._nested, 0.0
+            started = time.perf_counter()
+            self.values[name] = self.registry.aggregates[name](self)
+            elapsed = time.perf_counter() - started
+            # Время агрегата без вложенных агрегатов: они записаны в timings отдельно
+            self.timings[name] = elapsed - self._nested
+            self._nested = outer + elapsed
+        return self.values[name]
+
+    def __contains__(self, name):
+        return name in self.values
+
+def render_chart(key, fn, args, options):
+    """Строит один график и замеряет время; выполняется в процессе приложения или в пуле."""
+    started = time.perf_counter()
+    try:
+        html = fn(*args, **options)
+    except Exception as e:
+        print(f"[ERROR] Ошибка при построении графика {key}: {str(e)}")
+        html = None
+    return html, time.perf_counter() - started
+
+class ChartRegistry:
+    """
+    Реестр графиков страницы анализа.
+
+    Агрегат — функция от AnalysisContext, график — функция от нужных ему агрегатов,
+    возвращающая HTML-фрагмент или None, если данных для графика недостаточно.
+    run() считает только агрегаты выбранных графиков, каждый один раз, и замеряет время.
+
+    С пулом процессов агрегаты считаются здесь же, а в пул уходят функция графика и его
+    агрегаты; сами вакансии между процессами не передаются. Графики с local=True
+    (например, карта, которая регистрирует точки в памяти приложения) строятся на месте.
+    Готовые фрагменты берутся из кэша по хэшу агрегатов и параметров отрисовки.
+    """
+
+    def __init__(self):
+        self.aggregates = {}
+        self.charts = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def aggregate(self, name):
+        def register(fn):
+            self.aggregates[name] = fn
+            return fn
+        return register
+
+    def chart(self, key, needs=(), local=False, options=None, cache=True, displayed=True):
+        """
+        options — параметры отрисовки: передаются функции графика и входят в ключ кэша.
+        cache=False — фрагмент не кэшируется (у графика есть побочные эффекты).
+        displayed=False — шаблон страницы график не выводит; он строится, только если его
+        запросили явно.
+        """
+        def register(fn):
+            self.charts[key] = {
+                "fn": fn, "needs": tuple(needs), "local": local,
+                "options": dict(options or {}), "cache": cache, "displayed": displayed,
+            }
+            return fn
+        return register
+
+    def displayed_keys(self):
+        return [key for key, spec in self.charts.items() if spec["displayed"]]
+
+    def run(self, ctx, keys=None, executor=None, cache=None):
+        """
+        Строит графики keys (по умолчанию те, что выводит шаблон) в порядке регистрации;
+        возвращает их и время в мс.
+        executor — пул процессов (ProcessPoolExecutor) или None для построения по очереди;
+        cache — кэш фрагментов (render_cache.RenderCache) или None.
+        """
+        keys = self.displayed_keys() if keys is None else keys
+        selected = [key for key in self.charts if key in keys]
+        tasks, cache_keys, results = {}, {}, {}
+        for key in selected:
+            spec = self.charts[key]
+            args = [ctx[name] for name in spec["needs"]]
+            tasks[key] = (spec["fn"], args, spec["options"])
+            if cache is not None and spec["cache"]:
+                started = time.perf_counter()
+                cache_keys[key] = fingerprint(key, args, spec["options"])
+                html = cache.get(key, cache_keys[key])
+                if html is not None:
+                    results[key] = (html, time.perf_counter() - started)
+
+        futures = {}
+        if executor is not None:
+            try:
+                futures = {key: executor.submit(render_chart, key, *tasks[key])
+                           for key in selected if key not in results and not self.charts[key]["local"]}
+            except (BrokenProcessPool, RuntimeError) as e:
+                print(f"[ERROR] Пул процессов графиков недоступен, строим по очереди: {str(e)}")
+
+        visualizations, timings = {}, {}
+        for key in selected:
+            result = results.get(key)
+            if result is None and key in futures:
+                try:
+                    result = futures[key].result()
+                except Exception as e:
+                    print(f"[ERROR] График {key} не построен в пуле процессов, строим на месте: {str(e)}")
+            if result is None:
+                result = render_chart(key, *tasks[key])
+            html, seconds = result
+            if key in cache_keys and key not in results and html is not None:
+                cache.set(key, cache_keys[key], html)
+            timings[key] = round(seconds * 1000, 2)
+            if html is not None:
+                visualizations[key] = html
+        aggregate_timings = {name: round(seconds * 1000, 2) for name, seconds in ctx.timings.items()}
+        self._record(timings, aggregate_timings)
+        return visualizations, {"charts": timings, "aggregates": aggregate_timings}
+
+    def _record(self, charts, aggregates):
+        with self._lock:
+            for kind, timings in (("charts", charts), ("aggregates", aggregates)):
+                stats = self._stats.setdefault(kind, {})
+                for name, ms in timings.items():
+                    item = stats.setdefault(name, {"runs": 0, "total_ms": 0.0, "last_ms": 0.0})
+                    item["runs"] += 1
+                    item["total_ms"] += ms
+                    item["last_ms"] = ms
+
+    def stats(self):
+        with self._lock:
+            return {
+                kind: {
+                    name: {"runs": item["runs"], "avg_ms": round(item["total_ms"] / item["runs"], 2), "last_ms": item["last_ms"]}
+                    for name, item in stats.items()
+                }
+                for kind, stats in self._stats.items()
+            }
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from app.config import Config
+
+EXPERIENCE_ORDER = {
+    'Нет опыта': 0,
+    'От 1 года до 3 лет': 1,
+    'От 3 до 6 лет': 2,
+    'Более 6 лет': 3
+}
+
+def _name(value):
+    """Название справочного поля: {"name": ...} или строка."""
+    if not value:
+        return None
+    if isinstance(value, dict):
+        return value.get("name") or str(value)
+    return value
+
+def _categorical(values):
+    """Категориальная колонка; категории в порядке первого появления, None — пропуск."""
+    codes, categories = pd.factorize(np.array(values, dtype=object))
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def build_analysis_frame(vacancies, salaries):
+    """
+    Одна таблица на запрос: по строке на вакансию с колонками avg_salary, experience,
+    employment, schedule, area_id, area_name, employer и published_date.
+    salaries — колонки CurrencyConverter.salary_columns.
+    """
+    areas = [v.get("area") or {} for v in vacancies]
+    area_id = _categorical([None if a.get("id") is None else str(a["id"]) for a in areas])
+
+    # Дата разбирается один раз на каждое уникальное значение
+    days = _categorical([(v.get("published_at") or "")[:10] or None for v in vacancies])
+    day_values = pd.to_datetime(pd.Series(days.categories, dtype=object), format="%Y-%m-%d", errors="coerce").to_numpy()
+    published_date = np.append(day_values, np.datetime64("NaT")).astype("datetime64[ns]")[days.codes]
+
+    return pd.DataFrame({
+        "avg_salary": np.asarray(salaries["avg"], dtype=float),
+        "experience": _categorical([_name(v.get("experience")) for v in vacancies]),
+        "employment": _categorical([_name(v.get("employment")) for v in vacancies]),
+        "schedule": _categorical([_name(v.get("schedule")) for v in vacancies]),
+        "area_id": area_id,
+        "area_name": _categorical([a.get("name") or None for a in areas]),
+        "employer": _categorical([(v.get("employer") or {}).get("name") or None for v in vacancies]),
+        "published_date": published_date,
+    })
+
+def salary_frame(frame):
+    return frame[frame["avg_salary"].notna()]
+
+def salary_histogram(values, bins=None, scale=None, clip=None):
+    """
+    Гистограмма зарплат для графика: {"bins": границы столбцов, "counts": число вакансий,
+    "scale": "linear" | "log", "clipped": {"below": n, "above": n}}.
+    Значения за квантилями clip не отбрасываются, а попадают в крайние столбцы; сколько их,
+    указано в clipped. Размер ответа зависит только от числа столбцов. Границы — суммы в валюте
+    зарплат, поэтому CurrencyConverter.convert_all переводит такую сводку как есть.
+    """
+    bins = bins or Config.SALARY_HISTOGRAM_BINS
+    scale = scale or Config.SALARY_HISTOGRAM_SCALE
+    clip = Config.SALARY_HISTOGRAM_CLIP if clip is None else clip
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if scale == "log":
+        values = values[values > 0]
+    if not len(values):
+        return {"bins": [], "counts": [], "scale": scale, "clipped": {"below": 0, "above": 0}}
+
+    # Обрезка имеет смысл, только когда за каждым квантилем есть хотя бы одно значение
+    if clip and len(values) * min(clip[0], 1 - clip[1]) >= 1:
+        low, high = np.quantile(values, clip)
+    else:
+        low, high = values.min(), values.max()
+    if high <= low:
+        edges = np.array([low - 0.5, high + 0.5]) if scale != "log" else np.array([low / 1.1, high * 1.1])
+    elif scale == "log":
+        edges = np.geomspace(low, high, bins + 1)
+    else:
+        edges = np.linspace(low, high, bins + 1)
+    below, above = int((values < edges[0]).sum()), int((values > edges[-1]).sum())
+    counts, _ = np.histogram(np.clip(values, edges[0], edges[-1]), bins=edges)
+    return {
+        "bins": np.round(edges, 2).tolist(),
+        "counts": counts.tolist(),
+        "scale": scale,
+        "clipped": {"below": below, "above": above},
+    }
+
+def experience_sort_key(exp_name):
+    return EXPERIENCE_ORDER.get(exp_name, 999)
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import plotly
+import wordcloud
+
+from app.api.cache import ResultCache
+from app.config import Config
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Версии библиотек отрисовки входят в ключ: после обновления plotly дисковый уровень
+# не отдаёт описания графиков, собранные под прежнюю версию plotly.js
+RENDER_LIBRARIES = (("plotly", plotly.__version__), ("wordcloud", wordcloud.__version__))
+
+def _feed(digest, value):
+    """Добавляет значение в хэш: таблицы и массивы — по содержимому, остальное — по repr."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(type(value).__name__.encode())
+        columns = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+        dtypes = list(value.dtypes) if isinstance(value, pd.DataFrame) else [value.dtype]
+        digest.update(repr((columns, [str(t) for t in dtypes], list(value.index.names))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr(("ndarray", str(value.dtype), value.shape)).encode())
+        digest.update(pickle.dumps(value.tolist()) if value.dtype == object else np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        digest.update(f"dict:{len(value)}".encode())
+        for key in sorted(value, key=str):
+            _feed(digest, key)
+            _feed(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}:{len(value)}".encode())
+        for item in value:
+            _feed(digest, item)
+    else:
+        digest.update(repr(value).encode())
+
+def fingerprint(chart, args, options):
+    """Ключ фрагмента: график, версии отрисовки и библиотек, параметры и содержимое агрегатов."""
+    digest = hashlib.sha256()
+    _feed(digest, (chart, Config.RENDER_CACHE_VERSION, RENDER_LIBRARIES, options))
+    for arg in args:
+        _feed(digest, arg)
+    return digest.hexdigest()
+
+class RenderCache:
+    """
+    Кэш готовых фрагментов графиков по содержимому: одинаковые агрегаты и параметры
+    отрисовки дают тот же ключ, и фрагмент отдаётся без построения.
+
+    Первый уровень — LRU в памяти процесса (Config.RENDER_CACHE_SIZE записей),
+    второй — необязательный SQLite-файл Config.RENDER_CACHE_PATH, общий для воркеров.
+    """
+
+    def __init__(self, path=None):
+        self.memory = ResultCache(Config.RENDER_CACHE_SIZE, Config.RENDER_CACHE_TTL)
+        self.path = path if path is not None else Config.RENDER_CACHE_PATH
+        self._lock = threading.Lock()
+        self._charts = {}
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS render (
+                        key TEXT PRIMARY KEY,
+                        chart TEXT NOT NULL,
+                        html TEXT NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, chart, outcome):
+        with self._lock:
+            counters = self._charts.setdefault(chart, {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    def get(self, chart, key):
+        html = self.memory.get(key)
+        if html is not None:
+            self._count(chart, "memory_hits")
+            return html
+        if self.path:
+            with self._connect() as conn:
+                row = conn.execute("SELECT html FROM render WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+            if row is not None:
+                self.memory.set(key, row[0])
+                self._count(chart, "disk_hits")
+                return row[0]
+        self._count(chart, "misses")
+        return None
+
+    def set(self, chart, key, html):
+        self.memory.set(key, html)
+        if not self.path:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO render (key, chart, html, expires_at) VALUES (?, ?, ?, ?)",
+                (key, chart, html, time.time() + Config.RENDER_CACHE_DISK_TTL)
+            )
+            # Сверх лимита удаляются записи, которые устареют раньше остальных
+            conn.execute(
+                "DELETE FROM render WHERE key IN (SELECT key FROM render ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (Config.RENDER_CACHE_DISK_SIZE,)
+            )
+
+    def stats(self):
+        disk = None
+        if self.path:
+            with self._connect() as conn:
+                disk = {"size": conn.execute("SELECT COUNT(*) FROM render").fetchone()[0]}
+        with self._lock:
+            charts = {}
+            for chart, counters in self._charts.items():
+                lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+                charts[chart] = dict(counters, hit_rate=round((lookups - counters["misses"]) / lookups, 3) if lookups else None)
+        return {"memory": self.memory.stats(), "disk": disk, "charts": charts}
+
+def get_render_cache():
+    """Общий кэш фрагментов или None, если Config.RENDER_CACHE_ENABLED выключен."""
+    global _cache
+    if not Config.RENDER_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RenderCache()
+    return _cache
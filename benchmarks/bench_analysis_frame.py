@@ -0,0 +1,129 @@
+"""
+Подсчёт показателей блоков визуализации на 100 000 синтетических вакансий:
+прежние циклы по словарям в каждом блоке против одной таблицы анализа и groupby.
+Построение графиков не замеряется, только агрегаты, из которых они строятся.
+
+Запуск из корня проекта: python -m benchmarks.bench_analysis_frame
+"""
+import random
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from app.services.frame import build_analysis_frame, salary_frame
+
+VACANCY_COUNT = 100000
+
+AREAS = [("1002", "Минск"), ("1003", "Гомель"), ("1005", "Витебск"), ("1006", "Гродно"), ("1007", "Брест"),
+         ("1004", "Могилев"), ("2239", "Барановичи"), ("2301", "Лида"), ("2311", "Борисов"), ("2334", "Бобруйск")]
+EXPERIENCE = ["Нет опыта", "От 1 года до 3 лет", "От 3 до 6 лет", "Более 6 лет"]
+SCHEDULE = ["Полный день", "Гибкий график", "Удаленная работа", "Сменный график"]
+EMPLOYMENT = ["Полная занятость", "Частичная занятость", "Проектная работа"]
+
+def make_vacancies():
+    rng = random.Random(3)
+    vacancies = []
+    for i in range(VACANCY_COUNT):
+        area_id, area_name = rng.choice(AREAS)
+        low = rng.choice([None, rng.randint(500, 4000)])
+        high = rng.choice([None, rng.randint(4000, 9000)])
+        vacancies.append({
+            "id": str(i),
+            "area": {"id": area_id, "name": area_name},
+            "employer": {"name": f"Компания {rng.randint(0, 3000)}"},
+            "salary": {"from": low, "to": high, "currency": "BYN"} if low or high else None,
+            "experience": {"name": rng.choice(EXPERIENCE)},
+            "schedule": {"name": rng.choice(SCHEDULE)},
+            "employment": {"name": rng.choice(EMPLOYMENT)},
+            "published_at": f"2024-{rng.randint(1, 6):02d}-{rng.randint(1, 28):02d}T10:00:00+0300",
+        })
+    return vacancies
+
+def salary_columns(vacancies):
+    low = np.array([(v["salary"] or {}).get("from") or np.nan for v in vacancies], dtype=float)
+    high = np.array([(v["salary"] or {}).get("to") or np.nan for v in vacancies], dtype=float)
+    avg = np.where(np.isnan(low), high, np.where(np.isnan(high), low, (low + high) / 2))
+    return {"from": low, "to": high, "avg": avg}
+
+def avg_salary(s):
+    if not s:
+        return None
+    f, t = s.get("from"), s.get("to")
+    if f and t:
+        return (f + t) / 2
+    return f or t or None
+
+def legacy(vacancies):
+    """Прежняя схема: каждый блок заново обходит вакансии и пересчитывает среднюю зарплату."""
+    # generate_general_block: публикации по дням и generate_regions_chart
+    dates = defaultdict(int)
+    region_counts = defaultdict(int)
+    for v in vacancies:
+        if v.get("published_at"):
+            dates[v["published_at"][:10]] += 1
+        if v.get("area", {}).get("name"):
+            region_counts[v["area"]["name"]] += 1
+    # generate_salary_block
+    salary_data, by_exp, by_region = [], defaultdict(list), defaultdict(list)
+    for v in vacancies:
+        a = avg_salary(v.get("salary"))
+        if a is None:
+            continue
+        salary_data.append(a)
+        by_exp[v["experience"]["name"]].append(a)
+        by_region[v["area"]["name"]].append(a)
+    exp_stats = {k: (np.median(x), np.mean(x)) for k, x in by_exp.items()}
+    region_stats = {k: (np.mean(x), np.median(x), len(x)) for k, x in by_region.items()}
+    # generate_experience_block
+    experience, employment, schedule = defaultdict(int), defaultdict(int), defaultdict(int)
+    for v in vacancies:
+        experience[v["experience"]["name"]] += 1
+        employment[v["employment"]["name"]] += 1
+        schedule[v["schedule"]["name"]] += 1
+    # generate_employers_block
+    employers, employer_salaries = defaultdict(int), defaultdict(list)
+    for v in vacancies:
+        emp = v.get("employer", {}).get("name")
+        if emp:
+            employers[emp] += 1
+            a = avg_salary(v.get("salary"))
+            if a is not None:
+                employer_salaries[emp].append(a)
+    employer_avg = {k: sum(x) / len(x) for k, x in employer_salaries.items() if len(x) >= 2}
+    return len(salary_data), exp_stats, region_stats, len(employer_avg)
+
+def columnar(vacancies, salaries):
+    frame = build_analysis_frame(vacancies, salaries)
+    frame.groupby("published_date").size()
+    frame["area_name"].value_counts()
+    salaried = salary_frame(frame)
+    exp_stats = salaried.groupby("experience", observed=True)["avg_salary"].agg(["median", "mean"])
+    region_stats = salaried.groupby("area_name", observed=True)["avg_salary"].agg(["mean", "median", "count"])
+    for column in ("experience", "employment", "schedule"):
+        frame[column].value_counts(sort=False)
+    frame["employer"].value_counts()
+    employer_avg = salaried.groupby("employer", observed=True)["avg_salary"].agg(["mean", "count"])
+    employer_avg = employer_avg[employer_avg["count"] >= 2]
+    return len(salaried), exp_stats, region_stats, len(employer_avg)
+
+def measure(name, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<36} {elapsed:>9.3f}")
+    return result, elapsed
+
+def main():
+    vacancies = make_vacancies()
+    salaries = salary_columns(vacancies)
+    print(f"Вакансий: {len(vacancies)}")
+    print(f"{'вариант':<36} {'время, с':>9}")
+    old, old_time = measure("циклы по словарям в каждом блоке", legacy, vacancies)
+    new, new_time = measure("таблица анализа + groupby", columnar, vacancies, salaries)
+    print(f"Ускорение: {old_time / new_time:.1f}x")
+    if old[0] != new[0] or old[3] != new[3] or len(old[2]) != len(new[2]):
+        print("[WARNING] Результаты различаются")
+
+if __name__ == "__main__":
+    main()
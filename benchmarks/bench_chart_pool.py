@@ -0,0 +1,82 @@
+"""
+Построение графиков страницы анализа на 50 000 синтетических вакансий: по очереди
+в процессе приложения против постоянного пула процессов (Config.VISUALIZATION_PROCESSES).
+Агрегаты считаются один раз и в замер не входят — сравнивается только построение графиков.
+
+Запуск из корня проекта: python -m benchmarks.bench_chart_pool [число процессов]
+(по умолчанию — число ядер).
+"""
+import os
+import random
+import sys
+import time
+
+from app.config import Config
+from app.services.charts import AnalysisContext
+from app.services import visualization
+
+VACANCY_COUNT = 50000
+ROUNDS = 3
+
+AREAS = [("1002", "Минск"), ("1003", "Гомель"), ("1005", "Витебск"), ("1006", "Гродно"), ("1007", "Брест"),
+         ("1004", "Могилев"), ("2239", "Барановичи"), ("2301", "Лида"), ("2311", "Борисов"), ("2334", "Бобруйск")]
+EXPERIENCE = ["Нет опыта", "От 1 года до 3 лет", "От 3 до 6 лет", "Более 6 лет"]
+SCHEDULE = ["Полный день", "Гибкий график", "Удаленная работа", "Сменный график"]
+EMPLOYMENT = ["Полная занятость", "Частичная занятость", "Проектная работа"]
+SKILLS = [f"Навык {i}" for i in range(400)]
+
+def make_vacancies():
+    rng = random.Random(7)
+    vacancies = []
+    for i in range(VACANCY_COUNT):
+        area_id, area_name = rng.choice(AREAS)
+        low = rng.choice([None, rng.randint(500, 4000)])
+        vacancies.append({
+            "id": str(i),
+            "area": {"id": area_id, "name": area_name},
+            "employer": {"name": f"Компания {rng.randint(0, 3000)}"},
+            "salary": {"from": low, "to": low and low + rng.randint(0, 3000), "currency": "BYN"} if low else None,
+            "experience": {"name": rng.choice(EXPERIENCE)},
+            "schedule": {"name": rng.choice(SCHEDULE)},
+            "employment": {"name": rng.choice(EMPLOYMENT)},
+            "published_at": f"2024-{rng.randint(1, 6):02d}-{rng.randint(1, 28):02d}T10:00:00+0300",
+            "key_skills": [{"name": rng.choice(SKILLS)} for _ in range(rng.randint(0, 6))],
+        })
+    return vacancies
+
+def measure(name, ctx, keys, executor):
+    best = None
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        charts, timings = visualization.registry.run(ctx, keys, executor=executor)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<36} {best:>9.3f} {sum(timings['charts'].values()) / 1000:>14.3f}")
+    return charts, best, timings["charts"]
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    Config.RATES_BY_PUBLICATION_DATE = False
+    Config.VISUALIZATION_PROCESSES = processes
+    visualization.warm_chart_pool()
+
+    vacancies = make_vacancies()
+    ctx = AnalysisContext(visualization.registry, vacancies=vacancies, filters={"currency": "BYN"})
+    # Карта строится в процессе приложения и зависит от геокодера, в замер она не входит
+    keys = [key for key in visualization.registry.displayed_keys() if key != "map_data"]
+    visualization.registry.run(ctx, keys)
+
+    print(f"Вакансий: {len(vacancies)}, графиков: {len(keys)}, ядер: {os.cpu_count()}, процессов в пуле: {processes}")
+    print(f"{'вариант':<36} {'время, с':>9} {'сумма графиков':>14}")
+    sequential, sequential_time, chart_timings = measure("по очереди", ctx, keys, None)
+    pooled, pooled_time, _ = measure(f"пул из {processes} процессов", ctx, keys, visualization.get_chart_pool())
+    print(f"Ускорение: {sequential_time / pooled_time:.1f}x")
+    # При достаточном числе ядер пул не может быть быстрее самого долгого графика
+    slowest = max(chart_timings, key=chart_timings.get)
+    print(f"Самый долгий график: {slowest}, {chart_timings[slowest] / 1000:.3f} с; "
+          f"предел ускорения {sequential_time / (chart_timings[slowest] / 1000):.1f}x")
+    if sequential.keys() != pooled.keys():
+        print("[WARNING] Наборы графиков различаются")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Пропускная способность классификатора IT-вакансий на 50 000 синтетических вакансий:
+прежняя проверка (отдельный regex на каждое ключевое слово) против скомпилированного KeywordMatcher.
+
+Запуск из корня проекта: python -m benchmarks.bench_it_classifier
+"""
+import json
+import random
+import re
+import time
+
+from app.config import Config
+from app.api.classifier import is_it_vacancy, it_matcher
+
+VACANCY_COUNT = 50000
+
+TITLES = ["Python developer", "Бухгалтер", "Java backend engineer", "Повар", "QA инженер",
+          "Водитель погрузчика", "Менеджер по продажам", "DevOps engineer", "Кладовщик", "Frontend React"]
+WORDS = ["опыт", "работа", "команда", "график", "офис", "обучение", "зарплата", "склад",
+         "клиенты", "развитие", "проект", "документы", "смена", "коллектив", "доставка"]
+
+def make_vacancies():
+    rng = random.Random(7)
+    vacancies = []
+    for i in range(VACANCY_COUNT):
+        vacancies.append({
+            "id": str(i),
+            "name": rng.choice(TITLES),
+            "description": " ".join(rng.choice(WORDS) for _ in range(60)),
+            "key_skills": rng.sample(["Python", "SQL", "Excel", "1С", "Git", "Продажи"], 2),
+            "employer": {"name": f"Компания {i % 500}"},
+        })
+    return vacancies
+
+def measure(name, fn, vacancies):
+    started = time.perf_counter()
+    matched = sum(1 for v in vacancies if fn(v))
+    elapsed = time.perf_counter() - started
+    print(f"{name:<28} {matched:>8} {elapsed:>9.2f} {len(vacancies) / elapsed:>14,.0f}")
+    return matched
+
+def main():
+    vacancies = make_vacancies()
+    # Прежняя проверка перечитывала файл для каждого вызова load_vacancies_with_filters,
+    # а не для каждой вакансии, — для честного сравнения читаем его один раз
+    with open(Config.DATA_PATH, encoding="utf-8") as f:
+        keywords = json.load(f).get("it_keywords", [])
+    patterns = [(kw, re.escape(kw)) for kw in keywords]
+
+    def legacy_loaded(v):
+        joined = " ".join([
+            (v.get("name") or "").lower(),
+            (v.get("description") or "").lower(),
+            " ".join(s.lower() for s in v.get("key_skills") or []),
+            (v.get("employer", {}).get("name") or "").lower(),
+        ])
+        for kw, kw_regex in patterns:
+            if re.search(r"\b" + kw_regex + r"\b", joined) or kw in joined:
+                return True
+        return False
+
+    it_matcher.is_match("")
+    print(f"Вакансий: {len(vacancies)}, ключевых слов: {len(it_matcher.keywords)}")
+    print(f"{'вариант':<28} {'IT':>8} {'время, с':>9} {'вакансий/с':>14}")
+    legacy = measure("regex на каждое слово", legacy_loaded, vacancies)
+    compiled = measure("KeywordMatcher", is_it_vacancy, vacancies)
+    if legacy != compiled:
+        print(f"[WARNING] Результаты различаются: {legacy} против {compiled}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Сравнение числа запросов и времени загрузки при размере страницы по умолчанию (20)
+и максимальном (100) на локальном мок-сервере API.
+
+Запуск из корня проекта: python -m benchmarks.bench_page_size
+"""
+import contextlib
+import io
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from app.config import Config
+from app.api import utils
+
+VACANCY_COUNT = 12000
+DAYS = 30
+LATENCY = 0.02
+
+def make_vacancies(start):
+    rng = random.Random(42)
+    vacancies = []
+    for i in range(VACANCY_COUNT):
+        published = start + timedelta(seconds=rng.randint(0, DAYS * 24 * 3600 - 1))
+        vacancies.append({
+            "id": str(i),
+            "name": "Python developer",
+            "published_at": published.strftime("%Y-%m-%dT%H:%M:%S+0300"),
+            "area": {"id": "1002", "name": "Минск"},
+        })
+    vacancies.sort(key=lambda v: v["published_at"])
+    return vacancies
+
+def start_mock_api(vacancies):
+    stats = {"requests": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with lock:
+                stats["requests"] += 1
+            query = {k: v[-1] for k, v in parse_qs(urlparse(self.path).query).items()}
+            date_from, date_to = query["date_from"], query["date_to"]
+            matched = [v for v in vacancies if date_from <= v["published_at"][:19] < date_to]
+            per_page = int(query.get("per_page", 20))
+            page = int(query.get("page", 0))
+            visible = matched[:(2000 // per_page) * per_page]
+            body = json.dumps({
+                "found": len(matched),
+                "pages": -(-len(visible) // per_page),
+                "per_page": per_page,
+                "items": visible[page * per_page:(page + 1) * per_page],
+            }).encode("utf-8")
+            time.sleep(LATENCY)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+def run(per_page, start, end, stats):
+    Config.FETCH_PER_PAGE = per_page
+    stats["requests"] = 0
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        items, complete = utils.fetch_cleaned_in_range(start, end, {"area": "16"})
+    elapsed = time.perf_counter() - started
+    return len(items), stats["requests"], elapsed, complete
+
+def main():
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=DAYS)
+    end = start + timedelta(days=DAYS)
+    server, stats = start_mock_api(make_vacancies(start))
+    host = f"127.0.0.1:{server.server_address[1]}"
+    utils.API_URL = f"http://{host}/vacancies"
+    # Мок ограничивается так же, как боевой API
+    Config.RATE_LIMITS[host] = Config.RATE_LIMITS["api.rabota.by"]
+
+    print(f"Вакансий: {VACANCY_COUNT}, задержка ответа: {LATENCY * 1000:.0f} мс, движок: {Config.FETCH_ENGINE}, "
+          f"лимит: {Config.RATE_LIMITS[host]['rate']} запросов/с")
+    print(f"{'per_page':>8} {'вакансий':>9} {'запросов':>9} {'время, с':>9}")
+    for per_page in (20, 100):
+        count, requests_made, elapsed, complete = run(per_page, start, end, stats)
+        print(f"{per_page:>8} {count:>9} {requests_made:>9} {elapsed:>9.2f}{'' if complete else ' (неполно)'}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
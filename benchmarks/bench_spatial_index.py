@@ -0,0 +1,91 @@
+"""
+Поиск вакансий в радиусе и прямоугольнике на 100 000 точек по территории Беларуси:
+линейный просмотр всех точек (векторизованный numpy) против SpatialIndex.
+
+Запуск из корня проекта: python -m benchmarks.bench_spatial_index
+"""
+import random
+import time
+
+import numpy as np
+
+from app.api.spatial import SpatialIndex, haversine_km
+
+POINT_COUNT = 100000
+QUERY_COUNT = 1000
+RADIUS_KM = 5
+# Полуразмеры прямоугольника в градусах: примерно 4 × 4 км
+BBOX_HALF = (0.02, 0.03)
+
+# Крупные города с долей точек; остальные точки рассеяны по стране
+CITIES = [(53.902, 27.561, 0.45), (52.434, 30.990, 0.08), (55.190, 30.205, 0.07),
+          (53.678, 23.829, 0.07), (52.097, 23.734, 0.07), (53.900, 30.331, 0.06)]
+
+def make_points():
+    rng = random.Random(11)
+    points = []
+    for i in range(POINT_COUNT):
+        r = rng.random()
+        for lat, lng, share in CITIES:
+            if r < share:
+                lat, lng = lat + rng.gauss(0, 0.05), lng + rng.gauss(0, 0.08)
+                break
+            r -= share
+        else:
+            lat, lng = rng.uniform(51.3, 56.1), rng.uniform(23.2, 32.7)
+        low = rng.choice([None, rng.randint(500, 5000)])
+        points.append({
+            "id": str(i),
+            "lat": lat,
+            "lng": lng,
+            "salary": {"from": low, "to": low and low + rng.randint(0, 2000), "currency": "BYN"},
+        })
+    return points
+
+def make_queries(points):
+    rng = random.Random(5)
+    return [(p["lat"], p["lng"]) for p in rng.sample(points, QUERY_COUNT)]
+
+def measure(name, fn, queries):
+    started = time.perf_counter()
+    found = [fn(lat, lng) for lat, lng in queries]
+    elapsed = time.perf_counter() - started
+    total = sum(len(f) for f in found)
+    print(f"{name:<34} {total:>10} {elapsed * 1000 / len(queries):>12.3f} {len(queries) / elapsed:>12,.0f}")
+    return found
+
+def main():
+    points = make_points()
+    queries = make_queries(points)
+
+    started = time.perf_counter()
+    index = SpatialIndex(points)
+    print(f"Точек: {len(index)}, запросов: {QUERY_COUNT}, построение индекса: {time.perf_counter() - started:.2f} с")
+
+    lat = np.array([p["lat"] for p in points])
+    lng = np.array([p["lng"] for p in points])
+
+    def linear_radius(qlat, qlng):
+        return np.nonzero(haversine_km(qlat, qlng, lat, lng) <= RADIUS_KM)[0]
+
+    def linear_bbox(qlat, qlng):
+        return np.nonzero((lat >= qlat - BBOX_HALF[0]) & (lat <= qlat + BBOX_HALF[0]) & (lng >= qlng - BBOX_HALF[1]) & (lng <= qlng + BBOX_HALF[1]))[0]
+
+    print(f"{'вариант':<34} {'найдено':>10} {'мс/запрос':>12} {'запросов/с':>12}")
+    linear = measure(f"радиус {RADIUS_KM} км, линейный просмотр", linear_radius, queries)
+    indexed = measure(f"радиус {RADIUS_KM} км, SpatialIndex", lambda a, b: index.radius(a, b, RADIUS_KM), queries)
+    if any(set(index.ids[i]) != {points[j]["id"] for j in l} for i, l in zip(indexed, linear)):
+        print("[WARNING] Результаты поиска по радиусу различаются")
+    linear = measure("прямоугольник, линейный просмотр", linear_bbox, queries)
+    indexed = measure("прямоугольник, SpatialIndex",
+                      lambda a, b: index.bbox(a - BBOX_HALF[0], b - BBOX_HALF[1], a + BBOX_HALF[0], b + BBOX_HALF[1]), queries)
+    if any(set(index.ids[i]) != {points[j]["id"] for j in l} for i, l in zip(indexed, linear)):
+        print("[WARNING] Результаты поиска по прямоугольнику различаются")
+
+    started = time.perf_counter()
+    for qlat, qlng in queries[:100]:
+        index.summary(index.radius(qlat, qlng, RADIUS_KM))
+    print(f"Ответ с id и статистикой зарплат: {(time.perf_counter() - started) * 10:.3f} мс/запрос")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,194 @@
-import requests
+import json
 import logging
-from datetime import datetime
-from functools import lru_cache
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+import numpy as np
+from app.api.http import http_client
+from app.config import Config
+
+_converter = None
+_converter_lock = threading.Lock()
+
+# Валюты, курсы которых берутся из НБРБ
+NBRB_CURRENCIES = ('USD', 'EUR', 'RUB', 'KZT', 'UZS', 'KGS')
+
+def parse_nbrb_rates(rates_data):
+    """Курсы к BYN за одну единицу валюты из ответа НБРБ (только положительные значения)."""
+    rates = {}
+    for rate in rates_data:
+        currency = rate.get('Cur_Abbreviation')
+        if currency in NBRB_CURRENCIES:
+            scale = rate.get('Cur_Scale', 1)
+            value = rate.get('Cur_OfficialRate', 0)
+            if value > 0:
+                rates[currency] = value / scale
+    return rates
+
+class RateHistory:
+    """
+    Таблица дневных курсов НБРБ в SQLite (Config.RATES_HISTORY_PATH), загружаемая в память.
+
+    Недостающие дни запрашиваются у НБРБ по одному разу в фоновом потоке; для работы
+    без сети таблицу можно заполнить из файла-снимка Config.RATES_SNAPSHOT_PATH
+    формата {"ГГГГ-ММ-ДД": {"USD": 3.2, ...}}. В памяти курсы лежат матрицей
+    «день × валюта», и поиск курса на дату выполняется двоичным поиском по дням.
+    """
+
+    def __init__(self, path=None, snapshot_path=None):
+        self.logger = logging.getLogger(__name__)
+        self.path = path or Config.RATES_HISTORY_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.currencies = ('BYN',) + NBRB_CURRENCIES
+        self._column = {code: i for i, code in enumerate(self.currencies)}
+        self._lock = threading.Lock()
+        self._retry_at = {}
+        self._fetch_thread = None
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rates (
+                    day TEXT NOT NULL,
+                    currency TEXT NOT NULL,
+                    rate REAL NOT NULL,
+                    PRIMARY KEY (day, currency)
+                )
+            """)
+        self._reload()
+        snapshot_path = snapshot_path or Config.RATES_SNAPSHOT_PATH
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load_snapshot(snapshot_path)
+        elif snapshot_path:
+            self.logger.warning(f"Снимок курсов {snapshot_path} не найден: без сети зарплаты переводятся по текущему курсу")
+        elif not self._known:
+            self.logger.warning("Снимок курсов не задан (Config.RATES_SNAPSHOT_PATH) и таблица курсов пуста: "
+                                "без сети зарплаты переводятся по текущему курсу")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _reload(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT day, currency, rate FROM rates").fetchall()
+        days = sorted({day for day, _, _ in rows})
+        row_of = {day: i for i, day in enumerate(days)}
+        table = np.full((len(days), len(self.currencies)), np.nan)
+        table[:, 0] = 1.0
+        for day, currency, rate in rows:
+            column = self._column.get(currency)
+            if column is not None:
+                table[row_of[day], column] = rate
+        with self._lock:
+            self.days = np.array(days, dtype='datetime64[D]')
+            self.table = table
+            self._known = set(days)
+
+    def __len__(self):
+        return len(self._known)
+
+    def add_days(self, rates_by_day):
+        """Сохраняет курсы {день: {валюта: курс}} и обновляет таблицу в памяти."""
+        rows = [(day, code, rate) for day, rates in rates_by_day.items()
+                for code, rate in rates.items() if code in self._column and code != 'BYN']
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO rates (day, currency, rate) VALUES (?, ?, ?)", rows)
+        self._reload()
+
+    def load_snapshot(self, path):
+        """Добавляет из снимка дни, которых ещё нет в таблице."""
+        with open(path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+        missing = {day: rates for day, rates in snapshot.items() if day not in self._known}
+        self.add_days(missing)
+        self.logger.info(f"Из снимка {path} добавлено дней: {len(missing)}")
+
+    def export_snapshot(self, path):
+        with self._lock:
+            days, table = self.days, self.table
+        snapshot = {}
+        for day, row in zip(days.astype(str), table):
+            snapshot[day] = {code: float(rate) for code, rate in zip(self.currencies[1:], row[1:]) if not np.isnan(rate)}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+    def fetch_day(self, day):
+        response = http_client.get(Config.RATES_URL, params={'ondate': day})
+        response.raise_for_status()
+        return parse_nbrb_rates(response.json())
+
+    def _fetch_days(self, days):
+        for i, day in enumerate(days):
+            try:
+                rates = self.fetch_day(day)
+                self.add_days({day: rates})
+            except Exception as e:
+                # Скорее всего, НБРБ недоступен: оставшиеся дни откладываются целиком
+                self.logger.error(f"Ошибка при загрузке курсов на {day}: {e}")
+                retry_at = time.monotonic() + Config.RATES_RETRY
+                with self._lock:
+                    for pending in days[i:]:
+                        self._retry_at[pending] = retry_at
+                return
+
+    def fetch_missing_in_background(self, days):
+        """Запускает фоновую загрузку прошедших дней, которых нет в таблице."""
+        today = date.today().isoformat()
+        now = time.monotonic()
+        with self._lock:
+            if self._fetch_thread is not None and self._fetch_thread.is_alive():
+                return
+            missing = sorted(day for day in days
+                             if day not in self._known and day <= today and self._retry_at.get(day, 0) <= now)
+            if not missing:
+                return
+            self._fetch_thread = threading.Thread(target=self._fetch_days, args=(missing,), name="rates-history", daemon=True)
+            self._fetch_thread.start()
+
+    def rates_on(self, codes, days):
+        """
+        Курсы к BYN для пар (код валюты, день): берётся последний известный день не позже
+        заданного и не старше Config.RATES_HISTORY_MAX_GAP_DAYS; иначе NaN.
+        """
+        with self._lock:
+            known_days, table = self.days, self.table
+        result = np.full(len(days), np.nan)
+        if not len(known_days) or not len(days):
+            return result
+        columns = np.array([self._column.get(code, -1) for code in codes], dtype=np.int64)
+        rows = np.searchsorted(known_days, days, side='right') - 1
+        valid = (~np.isnat(days)) & (rows >= 0) & (columns >= 0)
+        rows = np.clip(rows, 0, None)
+        valid &= (days - known_days[rows]) <= np.timedelta64(Config.RATES_HISTORY_MAX_GAP_DAYS, 'D')
+        result[valid] = table[rows[valid], columns[valid]]
+        return result
 
 class CurrencyConverter:
+    """
+    Конвертер валют по курсам НБРБ.
+
+    Курсы живут Config.RATES_TTL секунд; устаревшие курсы продолжают отдаваться,
+    пока фоновый поток загружает новые. Последние успешно загруженные курсы
+    сохраняются в Config.RATES_CACHE_PATH, поэтому после перезапуска конвертер
+    сразу работает без сети.
+    """
 
-    def __init__(self):
+    def __init__(self, cache_path=None):
         self.logger = logging.getLogger(__name__)
         self.base_currency = 'BYN'
+        self.cache_path = cache_path or Config.RATES_CACHE_PATH
         
         # Фиксированные курсы валют (на случай недоступности API)
         self.fallback_rates = {
@@ -23,78 +204,134 @@ class CurrencyConverter:
 
         self.rates = {}
         self.last_update = None
-        self.update_rates()
-    
-    @lru_cache(maxsize=1)
+        self.source = 'fallback'
+        self.refresh_errors = 0
+        self._next_attempt = 0.0
+        self._refresh_thread = None
+        self._lock = threading.Lock()
+        self._load_persisted()
+        self.history = RateHistory()
+
+    def _load_persisted(self):
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                saved = json.load(f)
+            self.rates = saved['rates']
+            self.last_update = datetime.fromisoformat(saved['updated_at'])
+            self.source = 'disk'
+            self.logger.info(f"Курсы валют загружены с диска от {self.last_update}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning(f"Не удалось прочитать сохранённые курсы {self.cache_path}: {e}")
+
+    def _persist(self, rates, updated_at):
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated_at': updated_at.isoformat(), 'rates': rates}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def rate_age(self):
+        """Возраст текущих курсов в секундах; None, если используются запасные курсы."""
+        if self.last_update is None:
+            return None
+        return (datetime.now() - self.last_update).total_seconds()
+
+    def is_stale(self):
+        age = self.rate_age()
+        return age is None or age > Config.RATES_TTL
+
+    def get_rates(self):
+        """Текущие курсы без ожидания сети; устаревшие курсы обновляются в фоне."""
+        if self.is_stale():
+            self.refresh_in_background()
+        return self.rates or self.fallback_rates
+
+    def refresh_in_background(self):
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            if time.monotonic() < self._next_attempt:
+                return
+            self._refresh_thread = threading.Thread(target=self.update_rates, name="rates-refresh", daemon=True)
+            self._refresh_thread.start()
+
     def update_rates(self, force=False):
         try:
             # Можно использовать API НБРБ или другие открытые API для курсов валют
             # Пример: https://www.nbrb.by/api/exrates/rates?periodicity=0
-            response = requests.get('https://www.nbrb.by/api/exrates/rates?periodicity=0')
+            response = http_client.get(Config.RATES_URL)
             
             if response.status_code != 200:
                 self.logger.warning(f"Не удалось получить курсы валют. Код: {response.status_code}")
-                return self.fallback_rates
+                return self._refresh_failed()
                 
             rates_data = response.json()
 
             rates = {self.base_currency: 1.0}
-            
-            for rate in rates_data:
-                currency = rate.get('Cur_Abbreviation')
-                if currency in ['USD', 'EUR', 'RUB', 'KZT', 'UZS', 'KGS']:
-                    scale = rate.get('Cur_Scale', 1)
-                    value = rate.get('Cur_OfficialRate', 0)
-                    
-                    if value > 0:
-                        rates[currency] = value / scale
-                    else:
-                        rates[currency] = self.fallback_rates.get(currency, 1.0)
-
-            if 'RUB' in rates:
-                rates['RUR'] = rates['RUB']
-            else:
-                rates['RUB'] = self.fallback_rates.get('RUB', 1.0)
-                rates['RUR'] = rates['RUB']
+            parsed = parse_nbrb_rates(rates_data)
+            for currency in NBRB_CURRENCIES:
+                rates[currency] = parsed.get(currency, self.fallback_rates.get(currency, 1.0))
+
+            rates['RUR'] = rates['RUB']
                 
             self.logger.info(f"Курсы валют обновлены: {rates}")
+            updated_at = datetime.now()
             self.rates = rates
-            self.last_update = datetime.now()
+            self.last_update = updated_at
+            self.source = 'nbrb'
+            self._persist(rates, updated_at)
+            self.history.add_days({updated_at.date().isoformat(): parsed})
             return rates
             
         except Exception as e:
             self.logger.error(f"Ошибка при обновлении курсов валют: {e}")
-            self.rates = self.fallback_rates
-            return self.fallback_rates
+            return self._refresh_failed()
+
+    def _refresh_failed(self):
+        # Последние удачные курсы остаются в силе, повторная попытка — не раньше чем через RATES_RETRY
+        self.refresh_errors += 1
+        self._next_attempt = time.monotonic() + Config.RATES_RETRY
+        return self.rates or self.fallback_rates
+
+    def stats(self):
+        age = self.rate_age()
+        return {
+            "source": self.source,
+            "last_update": self.last_update.isoformat() if self.last_update else None,
+            "age_seconds": round(age, 1) if age is not None else None,
+            "ttl": Config.RATES_TTL,
+            "stale": self.is_stale(),
+            "refresh_errors": self.refresh_errors,
+            "history_days": len(self.history),
+        }
     
+    def normalize_code(self, code):
+        code = code.upper() if code else self.base_currency
+        return 'RUB' if code == 'RUR' else code
+
+    def _rate(self, code, rates):
+        if code not in rates:
+            self.logger.warning(f"Курс для {code} не найден, использую запасное значение")
+            return self.fallback_rates.get(code, 1.0)
+        return rates[code]
+
     def convert(self, amount, from_currency, to_currency):
         if amount is None or amount == 0:
             return 0
 
-        from_currency = from_currency.upper() if from_currency else self.base_currency
-        to_currency = to_currency.upper() if to_currency else self.base_currency
-
-        if from_currency == 'RUR':
-            from_currency = 'RUB'
-        if to_currency == 'RUR':
-            to_currency = 'RUB'
+        from_currency = self.normalize_code(from_currency)
+        to_currency = self.normalize_code(to_currency)
 
         if from_currency == to_currency:
             return amount
 
-        rates = self.rates if self.rates else self.update_rates()
-
-        if from_currency not in rates:
-            self.logger.warning(f"Курс для {from_currency} не найден, использую запасное значение")
-            from_rate = self.fallback_rates.get(from_currency, 1.0)
-        else:
-            from_rate = rates[from_currency]
-            
-        if to_currency not in rates:
-            self.logger.warning(f"Курс для {to_currency} не найден, использую запасное значение")
-            to_rate = self.fallback_rates.get(to_currency, 1.0)
-        else:
-            to_rate = rates[to_currency]
+        rates = self.get_rates()
+        from_rate = self._rate(from_currency, rates)
+        to_rate = self._rate(to_currency, rates)
 
         if to_currency == 'BYN':
             converted_amount = amount * from_rate
@@ -104,80 +341,135 @@ class CurrencyConverter:
             converted_amount = amount * from_rate / to_rate
         
         return round(converted_amount, 2)
-    
+
+    def _unique_codes(self, currencies):
+        """Нормализованные уникальные коды валют и индекс каждого элемента в них."""
+        codes, inverse = np.unique(np.array([c or '' for c in currencies], dtype=str), return_inverse=True)
+        return [self.normalize_code(c) for c in codes], inverse
+
+    def rate_vector(self, currencies):
+        """Курсы к BYN для массива кодов валют: каждый уникальный код разбирается один раз."""
+        codes, inverse = self._unique_codes(currencies)
+        rates = self.get_rates()
+        unique_rates = np.array([self._rate(c, rates) for c in codes], dtype=float)
+        return unique_rates[inverse]
+
+    def convert_array(self, amounts, currencies, to_currency):
+        """
+        Пакетная конвертация: amounts — числа (None и 0 дают NaN), currencies — код валюты
+        для всех сумм или массив кодов той же длины. Возвращает новый массив float.
+        """
+        values = np.array([a if a else np.nan for a in amounts], dtype=float)
+        if not len(values):
+            return values
+        if isinstance(currencies, str) or currencies is None:
+            from_rates = self._rate(self.normalize_code(currencies), self.get_rates())
+        else:
+            from_rates = self.rate_vector(currencies)
+        to_rate = self._rate(self.normalize_code(to_currency), self.get_rates())
+        return np.round(values * from_rates / to_rate, 2)
+
+    def convert_array_by_date(self, amounts, currencies, dates, to_currency):
+        """
+        Как convert_array, но каждая сумма переводится по курсу НБРБ на свою дату
+        (строка, начинающаяся с 'ГГГГ-ММ-ДД', или None). Если исторического курса нет,
+        берётся текущий, а недостающие дни догружаются в фоне.
+        """
+        values = np.array([a if a else np.nan for a in amounts], dtype=float)
+        if not len(values):
+            return values
+        days = np.array([d[:10] if d else 'NaT' for d in dates], dtype='datetime64[D]')
+        self.history.fetch_missing_in_background(np.unique(days[~np.isnat(days)]).astype(str).tolist())
+
+        codes, inverse = self._unique_codes(currencies)
+        from_codes = np.array(codes, dtype=object)[inverse]
+        from_rates = self.history.rates_on(from_codes, days)
+        from_rates = np.where(np.isnan(from_rates), self.rate_vector(currencies), from_rates)
+
+        to_code = self.normalize_code(to_currency)
+        to_rates = self.history.rates_on([to_code] * len(values), days)
+        to_rates = np.where(np.isnan(to_rates), self._rate(to_code, self.get_rates()), to_rates)
+        return np.round(values * from_rates / to_rates, 2)
+
+    def salary_columns(self, vacancies, to_currency, by_date=None):
+        """
+        Колонки зарплат вакансий в валюте to_currency: from, to и середина вилки avg
+        (NaN, если значение не указано). Сами вакансии не копируются и не изменяются.
+        При by_date (по умолчанию Config.RATES_BY_PUBLICATION_DATE) суммы переводятся
+        по курсу на день публикации вакансии.
+        """
+        if by_date is None:
+            by_date = Config.RATES_BY_PUBLICATION_DATE
+        lows, highs, currencies, dates = [], [], [], []
+        for v in vacancies:
+            s = v.get('salary') or {}
+            lows.append(s.get('from'))
+            highs.append(s.get('to'))
+            currencies.append(s.get('currency'))
+            dates.append(v.get('published_at'))
+        if by_date:
+            low = self.convert_array_by_date(lows, currencies, dates, to_currency)
+            high = self.convert_array_by_date(highs, currencies, dates, to_currency)
+        else:
+            low = self.convert_array(lows, currencies, to_currency)
+            high = self.convert_array(highs, currencies, to_currency)
+        avg = np.where(np.isnan(low), high, np.where(np.isnan(high), low, (low + high) / 2))
+        return {'from': low, 'to': high, 'avg': avg, 'currency': to_currency}
+
     def convert_all(self, data, target_currency='BYN'):
-        result = data.copy()
+        """Переводит сводку из базовой валюты в target_currency; исходный словарь не меняется."""
+        result = dict(data)
 
         result['display_currency'] = target_currency
 
+        def convert_values(values):
+            return [None if np.isnan(x) else float(x) for x in self.convert_array(values, self.base_currency, target_currency)]
+
+        def convert_fields(items, fields):
+            items = [dict(item) for item in items]
+            for field in fields:
+                present = [item for item in items if field in item]
+                for item, value in zip(present, convert_values([item[field] for item in present])):
+                    item[field] = value or 0
+            return items
+
         if 'salary_stats' in result:
-            for key in ['min', 'max', 'mean', 'median']:
-                result['salary_stats'][key] = self.convert(
-                    result['salary_stats'][key],
-                    self.base_currency,
-                    target_currency
-                )
+            result['salary_stats'] = convert_fields([result['salary_stats']], ['min', 'max', 'mean', 'median'])[0]
 
+        # Сводка app.services.frame.salary_histogram: переводятся границы столбцов, счётчики те же
         if 'salary_histogram' in result:
-            result['salary_histogram']['bins'] = [
-                self.convert(edge, self.base_currency, target_currency)
-                for edge in result['salary_histogram']['bins']
-            ]
+            result['salary_histogram'] = dict(result['salary_histogram'])
+            result['salary_histogram']['bins'] = [x or 0 for x in convert_values(result['salary_histogram']['bins'])]
 
         if 'salary_by_region' in result:
-            for region_data in result['salary_by_region']:
-                region_data['mean'] = self.convert(
-                    region_data['mean'],
-                    self.base_currency,
-                    target_currency
-                )
-                region_data['median'] = self.convert(
-                    region_data['median'],
-                    self.base_currency,
-                    target_currency
-                )
+            result['salary_by_region'] = convert_fields(result['salary_by_region'], ['mean', 'median'])
 
         if 'salary_by_experience' in result:
-            for exp_data in result['salary_by_experience']:
-                exp_data['mean'] = self.convert(
-                    exp_data['mean'], 
-                    self.base_currency, 
-                    target_currency
-                )
-                exp_data['median'] = self.convert(
-                    exp_data['median'], 
-                    self.base_currency, 
-                    target_currency
-                )
+            result['salary_by_experience'] = convert_fields(result['salary_by_experience'], ['mean', 'median'])
 
         if 'top_employers_detailed' in result:
-            for employer_data in result['top_employers_detailed']:
-                if 'avg_salary' in employer_data:
-                    employer_data['avg_salary'] = self.convert(
-                        employer_data['avg_salary'],
-                        self.base_currency,
-                        target_currency
-                    )
+            result['top_employers_detailed'] = convert_fields(result['top_employers_detailed'], ['avg_salary'])
 
         if 'coordinates' in result:
-            for coord in result['coordinates']:
-                if coord.get('salary'):
-                    salary = coord['salary']
-                    
-                    if salary.get('from'):
-                        salary['from'] = self.convert(
-                            salary['from'],
-                            salary.get('currency', self.base_currency),
-                            target_currency
-                        )
-                        
-                    if salary.get('to'):
-                        salary['to'] = self.convert(
-                            salary['to'],
-                            salary.get('currency', self.base_currency),
-                            target_currency
-                        )
-                        
-                    salary['currency'] = target_currency
+            coordinates = [dict(coord) for coord in result['coordinates']]
+            with_salary = [coord for coord in coordinates if coord.get('salary')]
+            columns = self.salary_columns(with_salary, target_currency)
+            for i, coord in enumerate(with_salary):
+                salary = dict(coord['salary'])
+                if salary.get('from'):
+                    salary['from'] = float(columns['from'][i])
+                if salary.get('to'):
+                    salary['to'] = float(columns['to'][i])
+                salary['currency'] = target_currency
+                coord['salary'] = salary
+            result['coordinates'] = coordinates
         
-        return result 
+        return result
+
+def get_converter():
+    global _converter
+    if _converter is None:
+        with _converter_lock:
+            if _converter is None:
+                _converter = CurrencyConverter()
+    return _converter
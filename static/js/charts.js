@@ -0,0 +1,42 @@
+// Отрисовка графиков из JSON-описаний, которые сервер вставляет в страницу
+// (app.services.visualization.chart_html). plotly.js подключается один раз в base.html.
+(function() {
+    function renderChart(container) {
+        var source = container.querySelector('script[type="application/json"]');
+        if (!source || container.dataset.rendered) {
+            return;
+        }
+        container.dataset.rendered = '1';
+        var figure = JSON.parse(source.textContent);
+        var target = document.createElement('div');
+        target.style.width = '100%';
+        container.appendChild(target);
+        Plotly.newPlot(target, figure.data || [], figure.layout || {}, Object.assign({ responsive: true }, figure.config || {}));
+    }
+
+    function renderCharts() {
+        var charts = document.querySelectorAll('.plotly-chart');
+        if (!('IntersectionObserver' in window)) {
+            charts.forEach(renderChart);
+            return;
+        }
+        // Графики ниже экрана рисуются по мере прокрутки
+        var observer = new IntersectionObserver(function(entries) {
+            entries.forEach(function(entry) {
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    renderChart(entry.target);
+                }
+            });
+        }, { rootMargin: '300px 0px' });
+        charts.forEach(function(chart) {
+            observer.observe(chart);
+        });
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', renderCharts);
+    } else {
+        renderCharts();
+    }
+})();
@@ -0,0 +1,40 @@
+import random
+import unittest
+
+from app.api.spatial import SpatialIndex
+
+def make_points(count=1000):
+    rng = random.Random(3)
+    return [{"id": str(i), "lat": 53 + rng.random(), "lng": 27 + rng.random(), "salary": {"from": 1000}}
+            for i in range(count)]
+
+class SpatialIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SpatialIndex(make_points())
+
+    def test_huge_bbox_is_clamped_to_index_extent(self):
+        # Раньше число строк сетки росло с размером запроса, и процесс падал по памяти
+        found = self.index.bbox(-1e7, -10, 1e7, 80)
+        self.assertEqual(len(found), len(self.index))
+
+    def test_huge_radius_is_clamped_to_index_extent(self):
+        found = self.index.radius(53.5, 27.5, 1e9)
+        self.assertEqual(len(found), len(self.index))
+
+    def test_bbox_outside_index_is_empty(self):
+        self.assertEqual(len(self.index.bbox(60, 0, 70, 10)), 0)
+
+    def test_non_finite_query_is_empty(self):
+        self.assertEqual(len(self.index.bbox(float("nan"), 27, 54, 28)), 0)
+        self.assertEqual(len(self.index.radius(53.5, float("inf"), 5)), 0)
+
+    def test_bbox_matches_linear_scan(self):
+        points = make_points()
+        south, west, north, east = 53.2, 27.3, 53.6, 27.7
+        expected = {p["id"] for p in points if south <= p["lat"] <= north and west <= p["lng"] <= east}
+        found = self.index.summary(self.index.bbox(south, west, north, east))
+        self.assertEqual(set(found["ids"]), expected)
+
+if __name__ == "__main__":
+    unittest.main()